@@ -0,0 +1,180 @@
+import codecs
+import csv
+import json
+import mmap
+import pathlib
+import re
+import time
+import zipfile
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+# Tweet files of an archive zip, split into parts in big archives:
+# data/tweet.js, data/tweet-part1.js, ... (or tweets.js, tweets-part1.js, ...)
+TWEET_FILES = re.compile(r"tweets?(-part\d+)?\.js")
+
+# Rows without a timestamp are treated as old, as they always have been.
+MISSING_TIMESTAMP = "1999-01-01"
+
+MONTHS = {
+    month: f"{number:02d}"
+    for number, month in enumerate(
+        ("Jan", "Feb", "Mar", "Apr", "May", "Jun")
+        + ("Jul", "Aug", "Sep", "Oct", "Nov", "Dec"),
+        1,
+    )
+}
+
+
+def parse_cutoff(to_date: str) -> str:
+    """Validates a YYYY-MM-DD cutoff date once and returns it as a comparable key."""
+    time.strptime(to_date, "%Y-%m-%d")
+    return to_date
+
+
+def date_key(timestamp: str) -> str:
+    """
+    Returns the YYYY-MM-DD prefix of an archive timestamp.
+
+    Archive timestamps are fixed-format ("2016-05-01 12:34:56 +0000"), so the date
+    is the first 10 characters and compares correctly as a string.
+    """
+    return timestamp[:10] if timestamp else MISSING_TIMESTAMP
+
+
+def created_at_key(created_at: str) -> str:
+    """
+    Returns the YYYY-MM-DD date of a tweets.js created_at timestamp.
+
+    tweets.js uses the fixed API format "Wed Oct 10 20:19:24 +0000 2018".
+    """
+    if not created_at:
+        return MISSING_TIMESTAMP
+    if created_at[4:5] == "-":
+        return date_key(created_at)
+    _, month, day, _, _, year = created_at.split()
+    return f"{year}-{MONTHS[month]}-{int(day):02d}"
+
+
+def _filter_batch(ids: list, dates: list, cutoff: str, use_numpy: bool) -> list:
+    if use_numpy:
+        mask = np.array(dates, dtype="U10") < cutoff
+        return np.array(ids, dtype=np.int64)[mask].tolist()
+    return [tweet_id for tweet_id, date in zip(ids, dates) if date < cutoff]
+
+
+def iter_old_tweet_ids_csv(
+    tweets_csv_file, to_date: str, batch_size: int = 10000, use_numpy: bool = None
+):
+    """
+    Streams the ids of the tweets in a tweets.csv archive older than to_date.
+
+    Rows are filtered in batches of batch_size, with NumPy when it is installed
+    (or when use_numpy is set), the file is closed once the generator finishes.
+    """
+    cutoff = parse_cutoff(to_date)
+    if use_numpy is None:
+        use_numpy = np is not None
+    with open(tweets_csv_file, newline="") as in_file:
+        reader = csv.reader(in_file)
+        header = next(reader, [])
+        id_col, ts_col = header.index("tweet_id"), header.index("timestamp")
+        ids, dates = [], []
+        for row in reader:
+            if len(row) <= max(id_col, ts_col):
+                continue
+            ids.append(int(row[id_col] or 0))
+            dates.append(date_key(row[ts_col]))
+            if len(ids) == batch_size:
+                yield from _filter_batch(ids, dates, cutoff, use_numpy)
+                ids, dates = [], []
+        if ids:
+            yield from _filter_batch(ids, dates, cutoff, use_numpy)
+
+
+def _iter_json_array(reader, chunk_size: int = 1 << 16):
+    """
+    Incrementally decodes the objects of a (JS-wrapped) JSON array from reader.
+
+    Everything before the opening bracket (e.g. "window.YTD.tweet.part0 = ") is
+    skipped, only one chunk and one decoded object are held in memory at a time.
+    """
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", -1, False
+    while pos == -1:
+        chunk = reader.read(chunk_size)
+        if not chunk:
+            return
+        pos = chunk.find("[")
+        buf = chunk
+    pos += 1
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(buf) and buf[pos] == "]":
+            return
+        try:
+            if pos == len(buf):
+                raise ValueError("Empty buffer")
+            obj, pos = decoder.raw_decode(buf, pos)
+        except ValueError:
+            if eof:
+                raise
+            chunk = reader.read(chunk_size)
+            eof = not chunk
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+        yield obj
+
+
+def _open_js_sources(path):
+    """Yields text readers over a tweets.js file or the tweet parts of a zip archive."""
+    path = pathlib.Path(path)
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            names = sorted(
+                name
+                for name in archive.namelist()
+                if TWEET_FILES.fullmatch(pathlib.PurePosixPath(name).name)
+            )
+            for name in names:
+                with archive.open(name) as member:
+                    yield codecs.getreader("utf-8")(member)
+        return
+    with open(path, "rb") as in_file:
+        if path.stat().st_size == 0:
+            return
+        with mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield codecs.getreader("utf-8")(mapped)
+
+
+def iter_tweets_js(path):
+    """
+    Streams (tweet_id, created_at) from a tweets.js archive file or archive zip.
+
+    Plain files are memory-mapped and zip members are decompressed as a stream,
+    so memory use does not grow with the size of the archive.
+    """
+    for reader in _open_js_sources(path):
+        for obj in _iter_json_array(reader):
+            tweet = obj.get("tweet", obj)
+            yield int(tweet.get("id_str") or tweet["id"]), tweet.get("created_at", "")
+
+
+def iter_old_tweet_ids_js(path, to_date: str):
+    """Streams the ids of the tweets in a tweets.js archive older than to_date."""
+    cutoff = parse_cutoff(to_date)
+    for tweet_id, created_at in iter_tweets_js(path):
+        if created_at_key(created_at) < cutoff:
+            yield tweet_id
+
+
+def iter_old_tweet_ids(path, to_date: str):
+    """Streams old tweet ids from a tweets.csv, tweets.js or archive zip file."""
+    if str(path).lower().endswith(".csv"):
+        return iter_old_tweet_ids_csv(path, to_date)
+    return iter_old_tweet_ids_js(path, to_date)
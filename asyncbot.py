@@ -0,0 +1,462 @@
+import asyncio
+import csv
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+
+from archive import iter_old_tweet_ids
+from harvest import AuthorHarvest
+from twitterBot import TwitterBot, divide_chunks
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def shared_executor(max_workers: int = 32) -> ThreadPoolExecutor:
+    """Returns the thread pool that runs the blocking API calls of every async bot."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="twitterbot"
+            )
+    return _executor
+
+
+async def _aiter(items):
+    """Iterates over a regular or an asynchronous iterable."""
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+class AsyncTwitterBot:
+    """
+    Asyncio front-end of a TwitterBot.
+
+    The wrapped bot keeps the state (store, user cache, filters and rate limits),
+    only the waiting differs: rate limit delays are asyncio.sleep()s and the
+    blocking tweepy calls run on a thread pool shared by every AsyncTwitterBot of
+    the process, so the requests of many accounts can be in flight on one event
+    loop. The store is only used from the event loop thread.
+    """
+
+    def __init__(self, bot=None, executor=None, concurrency: int = 4, **kwargs):
+        self.bot = bot if bot is not None else TwitterBot(**kwargs)
+        self.logger = self.bot.logger
+        self.store = self.bot.store
+        self.executor = executor or shared_executor()
+        # requests of this bot in flight at once
+        self.concurrency = concurrency
+
+    @property
+    def twitter(self) -> object:
+        return self.bot.twitter
+
+    async def run_blocking(self, func, *args, **kwargs):
+        """Runs a blocking function on the shared thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    async def wait(self, endpoint: str = "default") -> float:
+        """Waits until the rate limit of endpoint allows another request."""
+        delay = self.bot.rate_scheduler.reserve(endpoint)
+        if delay > 0:
+            self.logger.debug(f"sleeping for {delay:.2f} seconds before {endpoint}.")
+            await asyncio.sleep(delay)
+        return delay
+
+    async def call_api(self, endpoint: str, method, *args, **kwargs):
+        """Calls a Twitter API method, paced by the rate limit of endpoint."""
+        await self.wait(endpoint)
+        scheduler = self.bot.rate_scheduler
+        try:
+            result, response = await self.run_blocking(
+                self.bot.transport.call, method, *args, **kwargs
+            )
+        except Exception as err:
+            response = getattr(err, "response", None)
+            scheduler.update_from_headers(endpoint, getattr(response, "headers", None))
+            raise
+        scheduler.update_from_headers(endpoint, getattr(response, "headers", None))
+        return result
+
+    async def for_each(self, func, items, limit: int = None) -> int:
+        """
+        Awaits func(item) for every item of a regular or asynchronous iterable,
+        with at most `limit` calls in flight. The first error cancels the calls
+        still running and is raised. Returns the number of items processed.
+        """
+        limit = limit or self.concurrency
+        pending = set()
+        processed = 0
+        try:
+            async for item in _aiter(items):
+                pending.add(asyncio.ensure_future(func(item)))
+                processed += 1
+                if len(pending) >= limit:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        task.result()
+            if pending:
+                done, pending = await asyncio.wait(pending)
+                for task in done:
+                    task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+        return processed
+
+    # ----------------------------------
+    async def sync_follows(self) -> dict:
+        """Syncs the followers and follows of the user, both listings at once."""
+        self.logger.info(
+            f"Syncing {self.bot.default_settings['twitter_handle']!r} "
+            "account followers and followings."
+        )
+        await asyncio.gather(
+            self.sync_ids("followers", self.twitter.followers_ids, "followers_ids"),
+            self.sync_ids("follows", self.twitter.friends_ids, "friends_ids"),
+        )
+        return self.bot.finish_sync()
+
+    async def sync_ids(
+        self, table: str, api_method, endpoint: str = "default", count: int = 5000
+    ) -> tuple:
+        """Coroutine version of TwitterBot.sync_ids."""
+        pages = self.page_ids(
+            endpoint, api_method, count=count, cursor=self.bot.start_sync(table)
+        )
+        try:
+            async for ids, cursor in pages:
+                self.bot.stage_page(table, ids, cursor)
+        except Exception:
+            self.bot.sync_failed(table)
+            raise
+        return self.bot.commit_sync(table)
+
+    async def page_ids(
+        self, endpoint: str, api_method, count: int = 5000, cursor: int = -1, **kwargs
+    ):
+        """Coroutine version of TwitterBot.page_ids."""
+        while cursor != 0:
+            ids, (_, cursor) = await self.call_api(
+                endpoint, api_method, cursor=cursor, count=count, **kwargs
+            )
+            yield ids, cursor
+
+    async def hydrate_users(self, user_ids: list):
+        """Streams the users of user_ids (see hydrate_batches)."""
+        async for users in self.hydrate_batches(user_ids):
+            for user_obj in users:
+                yield user_obj
+
+    async def hydrate_batches(self, user_ids: list):
+        """
+        Streams the users of user_ids in batches, cached users first. The missing
+        ones are looked up in batches of 100, `concurrency` batches at a time.
+        """
+        users, missing = self.bot.cached_users(user_ids)
+        if users:
+            yield users
+
+        in_flight = {}
+        try:
+            for batch in divide_chunks(missing, 100):
+                task = asyncio.ensure_future(
+                    self.call_api("lookup", self.twitter.lookup_users, user_ids=batch)
+                )
+                in_flight[task] = batch
+                if len(in_flight) < self.concurrency:
+                    continue
+                done, _ = await asyncio.wait(
+                    in_flight, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    users = self.bot.hydrated_batch(task, in_flight.pop(task))
+                    if users:
+                        yield users
+            while in_flight:
+                done, _ = await asyncio.wait(
+                    in_flight, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    users = self.bot.hydrated_batch(task, in_flight.pop(task))
+                    if users:
+                        yield users
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+    # ----------------------------------
+    async def follow_user(self, user_obj: object, **overrides):
+        """Coroutine version of TwitterBot.follow_user."""
+        if not hasattr(user_obj, "screen_name"):
+            user_obj = user_obj.user
+
+        try:
+            if not self.bot.should_follow(user_obj, **overrides):
+                return
+        except Exception as error:
+            self.bot.follow_failed(user_obj, error)
+            return
+        return await self.create_friendship(user_obj)
+
+    async def create_friendship(self, user_obj: object):
+        """Coroutine version of TwitterBot.create_friendship."""
+        try:
+            self.logger.info(f"Followed @{self.bot.user_stats(user_obj)}")
+            result = await self.call_api(
+                "follow", self.twitter.create_friendship, user_id=user_obj.id
+            )
+            self.bot.user_cache.invalidate(user_obj.id)
+        except Exception as error:
+            self.bot.follow_failed(user_obj, error)
+        else:
+            self.bot.record_follow(user_obj.id)
+            return result
+
+    async def admitted(self, pipeline, batches):
+        """Streams the users of batches that the candidate pipeline admits."""
+        async for users in batches:
+            for user_obj in pipeline.admit(users):
+                yield user_obj
+
+    async def follow_admitted(self, pipeline, user_obj: object):
+        """Follows user_obj, admitted by the candidate pipeline."""
+        if await self.create_friendship(user_obj):
+            pipeline.followed()
+            return True
+
+    async def unfollow_user(self, user_obj: object, **overrides):
+        """Coroutine version of TwitterBot.unfollow_user."""
+        try:
+            if not self.bot.should_unfollow(user_obj, **overrides):
+                return
+            result = await self.call_api(
+                "unfollow", self.twitter.destroy_friendship, user_id=user_obj.id
+            )
+            self.bot.user_cache.invalidate(user_obj.id)
+            self.logger.info(f"Unfollowed @{self.bot.user_stats(result)}")
+        except Exception as error:
+            self.logger.error(str(error))
+
+    async def search_pages(
+        self, phrase: str, count: int = 100, result_type="recent", since_id=None
+    ):
+        """Coroutine version of TwitterBot.search_pages."""
+        params = self.bot.search_params(phrase, count, result_type, since_id)
+        left = count
+        while params:
+            page = await self.call_api("search", self.twitter.search, **params)
+            if page:
+                yield page
+            left -= len(page)
+            params = self.bot.next_search_params(params, page, left)
+
+    async def search_authors(self, phrase: str, count: int = 200, result_type="recent"):
+        """Coroutine version of TwitterBot.search_authors."""
+        async for _, user_obj in self.harvest_authors([phrase], count, result_type):
+            yield user_obj
+
+    async def harvest_authors(self, phrases, count: int = 200, result_type="recent"):
+        """Coroutine version of TwitterBot.harvest_authors."""
+        async for phrase, users in self.harvest_batches(phrases, count, result_type):
+            for user_obj in users:
+                yield phrase, user_obj
+
+    async def harvest_batches(self, phrases, count: int = 200, result_type="recent"):
+        """Coroutine version of TwitterBot.harvest_batches, all phrases at once."""
+        harvest = phrases
+        if not isinstance(harvest, AuthorHarvest):
+            harvest = AuthorHarvest(self.store, phrases, _logger=self.logger)
+        pages = asyncio.Queue()
+
+        async def search(phrase, since_id):
+            try:
+                async for page in self.search_pages(
+                    phrase, count, result_type, since_id
+                ):
+                    await pages.put((phrase, page))
+            except Exception as err:
+                await pages.put((phrase, err))
+            else:
+                await pages.put((phrase, None))
+
+        tasks = [
+            asyncio.ensure_future(search(phrase, harvest.since_id(phrase)))
+            for phrase in harvest.phrases
+        ]
+        try:
+            running = len(tasks)
+            while running:
+                phrase, page = await pages.get()
+                if isinstance(page, list):
+                    users = harvest.add_page(phrase, page)
+                    if users:
+                        yield phrase, users
+                    continue
+                running -= 1
+                if page is None:
+                    harvest.finish(phrase)
+                else:
+                    self.logger.error(f"Search for {phrase!r} failed: {page}")
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def auto_follow_by_hashtag(
+        self,
+        phrase,
+        friends_count: int = 300,
+        count: int = 200,
+        auto_sync: bool = False,
+        result_type: str = "recent",
+    ) -> dict:
+        """Coroutine version of TwitterBot.auto_follow_by_hashtag."""
+        if auto_sync:
+            await self.sync_follows()
+        phrases = [phrase] if isinstance(phrase, str) else phrase
+        harvest = AuthorHarvest(self.store, phrases, _logger=self.logger)
+        pipeline = self.bot.candidate_pipeline(
+            "auto_follow_by_hashtag", self.bot.hashtag_filter(friends_count, count)
+        )
+
+        batches = (
+            users
+            async for _, users in self.harvest_batches(harvest, count, result_type)
+        )
+
+        async def follow(user_obj):
+            if await self.follow_admitted(pipeline, user_obj):
+                harvest.followed(user_obj.id)
+
+        await self.for_each(follow, self.admitted(pipeline, batches))
+        self.bot.log_pipeline("auto_follow_by_hashtag")
+        harvest.log_stats()
+        return harvest.stats
+
+    async def auto_follow_followers(self, auto_sync=False, delta=False):
+        """Follows back everyone who's followed you."""
+        if auto_sync:
+            await self.sync_follows()
+        not_following_back = self.bot.follow_back_candidates(delta)
+
+        if not not_following_back:
+            self.logger.warning("No-one to follow.")
+            return
+
+        self.logger.info(f"Following up to {len(not_following_back)} users.")
+        pipeline = self.bot.candidate_pipeline("auto_follow_followers")
+        batches = self.hydrate_batches(pipeline.unknown_ids(not_following_back))
+        users = self.admitted(pipeline, batches)
+        await self.for_each(partial(self.follow_admitted, pipeline), users)
+        self.bot.log_pipeline("auto_follow_followers")
+
+    async def auto_follow_followers_of_user(self, user_twitter_handle):
+        """Follows the followers of a specified user, one page of ids at a time."""
+        pages = self.page_ids(
+            "followers_ids", self.twitter.followers_ids, screen_name=user_twitter_handle
+        )
+        pipeline = self.bot.candidate_pipeline("auto_follow_followers_of_user")
+        async for page, _ in pages:
+            candidates = pipeline.unknown_ids(page)
+            self.logger.info(
+                f"Following up to {len(candidates)} of {len(page)} followers of "
+                f"{user_twitter_handle!r}."
+            )
+            users = self.admitted(pipeline, self.hydrate_batches(candidates))
+            await self.for_each(partial(self.follow_admitted, pipeline), users)
+        self.bot.log_pipeline("auto_follow_followers_of_user")
+
+    async def auto_unfollow_nonfollowers(
+        self, auto_sync: bool, unfollow_verified: bool = None, delta: bool = False,
+    ):
+        """Unfollows everyone who hasn't followed you back."""
+        if auto_sync:
+            await self.sync_follows()
+        not_following_back = self.bot.unfollow_candidates(delta)
+        if not not_following_back:
+            return
+
+        # update the "already followed" table with users who didn't follow back
+        self.store.add("already_followed", not_following_back)
+
+        self.logger.info(f"Un-following up to {len(not_following_back)} users.")
+        await self.for_each(
+            partial(self.unfollow_user, unfollow_verified=unfollow_verified),
+            self.hydrate_users(not_following_back),
+        )
+
+    # ----------------------------------
+    async def destroy_status(self, tweet_id: int, retries: int = 3, backoff=2.0):
+        """Coroutine version of TwitterBot.destroy_status."""
+        for attempt in range(retries + 1):
+            try:
+                await self.call_api("delete", self.twitter.destroy_status, id=tweet_id)
+                return True
+            except Exception as err:
+                delay = self.bot.retry_delay(tweet_id, err, attempt, retries, backoff)
+                if delay is None:
+                    return True
+                await asyncio.sleep(delay)
+
+    async def delete_tweets(self, tweet_ids, workers: int = 4, retries: int = 3) -> int:
+        """
+        Deletes the tweets of a regular or asynchronous iterable, `workers` at a
+        time. Deleted ids are logged in the store, and skipped on the next run.
+        Returns the number of tweets deleted.
+        """
+        done = self.store.ids("deleted_tweets")
+        deleted = 0
+
+        async def delete(tweet_id):
+            nonlocal deleted
+            if tweet_id in done:
+                return
+            try:
+                await self.destroy_status(tweet_id, retries)
+            except Exception as err:
+                self.logger.error(f"Could not delete tweet {tweet_id}: {err}")
+                return
+            self.logger.info(f"Deleted tweet: {tweet_id}")
+            self.store.add("deleted_tweets", [tweet_id])
+            deleted += 1
+
+        await self.for_each(delete, tweet_ids, limit=workers)
+        return deleted
+
+    async def read_archive(self, tweets_file, to_date: str, chunk_size: int = 1000):
+        """Streams the old tweet ids of an archive, read on the thread pool."""
+        old_tweet_ids = iter_old_tweet_ids(tweets_file, to_date)
+        while True:
+            chunk = await self.run_blocking(list, islice(old_tweet_ids, chunk_size))
+            if not chunk:
+                return
+            for tweet_id in chunk:
+                yield tweet_id
+
+    async def nuke_old_tweets(
+        self, to_date="2000-01-01", tweets_csv_file=None, workers=4
+    ):
+        """Coroutine version of TwitterBot.nuke_old_tweets."""
+        if not self.bot.check_nuke_args(to_date, tweets_csv_file):
+            return
+
+        try:
+            deleted = await self.delete_tweets(
+                self.read_archive(tweets_csv_file, to_date), workers=workers
+            )
+        except (OSError, ValueError, csv.Error):
+            self.logger.error("File corrupted: retry")
+            return
+
+        if deleted:
+            self.logger.info(f"Number of deleted tweets: {deleted}")
@@ -0,0 +1,40 @@
+"""
+Deletes per second of TwitterBot.delete_tweets against a local stub of the
+Twitter API, over HTTP through tweepy and the pooled transport.
+
+    python benchmarks/bench_delete.py --tweets 2000 --latency 0.02
+"""
+import argparse
+
+from common import fake_bot, timed
+from fakes import FakeEndpoints, FakeTwitter, make_user
+
+
+def bench(n_tweets: int, latency: float, workers: int) -> float:
+    api = FakeTwitter(
+        users=[make_user(1)],
+        tweets=[(i, 1, f"tweet {i}") for i in range(1, n_tweets + 1)],
+        latency=latency,
+    )
+    with FakeEndpoints(api) as endpoints:
+        bot = fake_bot(api, endpoints)
+        deleted, seconds = timed(
+            bot.delete_tweets, range(1, n_tweets + 1), workers=workers
+        )
+    assert deleted == n_tweets == len(api.deleted)
+    return deleted / seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tweets", type=int, default=2000)
+    parser.add_argument(
+        "--latency", type=float, default=0.02, help="seconds per API call"
+    )
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    print(f"{args.tweets} tweets, {args.latency * 1000:.0f} ms per call")
+    for workers in args.workers:
+        rate = bench(args.tweets, args.latency, workers)
+        print(f"{workers:>3} workers: {rate:8.1f} deletes/s")
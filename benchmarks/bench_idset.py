@@ -0,0 +1,71 @@
+"""
+Memory and time of the follower graph math (followers - following - already
+followed, membership tests) on IdSets and on builtin sets. The memory of the
+builtin sets leaves out their int objects (28 bytes each), which they share
+with the id lists.
+
+    python benchmarks/bench_idset.py --sizes 100000 1000000 3000000
+"""
+import argparse
+import random
+import tracemalloc
+
+from common import timed
+from idset import IdSet
+
+
+def allocated(build) -> tuple:
+    """Returns what build() returns and the memory it allocated, in bytes."""
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def graph(size: int) -> tuple:
+    """Id lists of an account: followers, follows and users followed in the past."""
+    ids = random.sample(range(1, 20 * size), 2 * size)
+    followers, follows = ids[:size], ids[size // 2 : size // 2 + size]
+    return followers, follows, random.sample(ids, size // 4)
+
+
+def bench(kind, lists: tuple, probes: list) -> dict:
+    (followers, follows, followed), memory = allocated(
+        lambda: tuple(kind(ids) for ids in lists)
+    )
+    candidates, difference = timed(lambda: followers - follows - followed)
+    hits, membership = timed(lambda: sum(i in follows for i in probes))
+    _, union = timed(lambda: followers | follows)
+    return {
+        "memory": memory / 2 ** 20,
+        "difference": difference * 1000,
+        "union": union * 1000,
+        "membership": membership / len(probes) * 1e6,
+        "result": (len(candidates), hits),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[100000, 1000000, 3000000]
+    )
+    parser.add_argument("--probes", type=int, default=100000)
+    args = parser.parse_args()
+
+    print(
+        f"{'ids':>9} {'type':>6} {'memory':>10} {'a - b - c':>11} {'a | b':>10} "
+        f"{'in':>8}"
+    )
+    for size in args.sizes:
+        lists = graph(size)
+        probes = random.sample(lists[0] + lists[1], args.probes)
+        results = {kind.__name__: bench(kind, lists, probes) for kind in (set, IdSet)}
+        assert results["set"]["result"] == results["IdSet"]["result"]
+        for name, result in results.items():
+            print(
+                f"{size:>9} {name:>6} {result['memory']:8.1f}MB "
+                f"{result['difference']:9.1f}ms {result['union']:8.1f}ms "
+                f"{result['membership']:6.2f}us"
+            )
@@ -0,0 +1,68 @@
+"""
+Cost of TwitterBot.ignore_user(check_user=True) as the number of ignored users
+grows, against the original scan of the non-following file.
+
+    python benchmarks/bench_ignore_index.py --sizes 10000 100000 1000000
+"""
+import argparse
+import random
+
+from types import SimpleNamespace
+
+from common import fake_bot, timed
+from fakes import FakeTwitter
+
+
+def file_scan(filename, user_obj) -> bool:
+    """The original check: read the whole file, then a linear scan."""
+    with open(filename) as in_file:
+        ids = [line.strip() for line in in_file]
+    return str(user_obj.id) in ids
+
+
+def bench(size: int, checks: int, scan_checks: int) -> tuple:
+    ignored = random.sample(range(1, 100 * size), size)
+    bot = fake_bot(FakeTwitter())
+    bot.store.add("non_following", ignored)
+    filename = bot.default_settings["non_following_file"]
+    with open(filename, "w") as out_file:
+        out_file.writelines(f"{i}\n" for i in ignored)
+
+    # the first load builds the Bloom filter from the store and saves it
+    _, build = timed(lambda: bot.ignored_ids)
+    bot._ignored_ids = None
+    _, load = timed(lambda: bot.ignored_ids)
+    # one in ten candidates is ignored, as in a typical follow-back run
+    users = [
+        SimpleNamespace(id=random.choice(ignored) if i % 10 == 0 else -i)
+        for i in range(checks)
+    ]
+    hits, seconds = timed(
+        lambda: sum(bot.ignore_user(user_obj, check_user=True) for user_obj in users)
+    )
+    assert hits == (checks + 9) // 10
+    _, scan = timed(lambda: [file_scan(filename, u) for u in users[:scan_checks]])
+    return build, load, seconds / checks, scan / scan_checks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10000, 100000, 1000000]
+    )
+    parser.add_argument("--checks", type=int, default=100000)
+    parser.add_argument(
+        "--scan-checks", type=int, default=5, help="checks timed with the file scan"
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'ignored':>10} {'build':>9} {'load':>9} {'per check':>11} "
+        f"{'file scan':>11}"
+    )
+    for size in args.sizes:
+        build, load, per_check, scan = bench(size, args.checks, args.scan_checks)
+        print(
+            f"{size:>10} {build * 1000:7.1f}ms {load * 1000:7.1f}ms "
+            f"{per_check * 1e6:9.2f}us {scan * 1000:9.2f}ms"
+        )
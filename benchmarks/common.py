@@ -0,0 +1,47 @@
+"""Helpers shared by the benchmarks: a TwitterBot wired to the test fakes."""
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(ROOT), str(ROOT / "tests")]
+
+import tweepy  # noqa: E402
+import twitterBot  # noqa: E402
+
+from loguru import logger  # noqa: E402
+
+from fakes import local_transport  # noqa: E402
+from ratelimit import DEFAULT_LIMITS, RateScheduler  # noqa: E402
+
+UNLIMITED = {endpoint: (1000000, 1) for endpoint in DEFAULT_LIMITS}
+
+
+def fake_bot(api, endpoints=None, user="bench") -> twitterBot.TwitterBot:
+    """
+    Returns a TwitterBot configured in a temporary home directory, without rate
+    limits, connected to a FakeTwitter or over HTTP to its FakeEndpoints server.
+    """
+    logger.remove()
+    os.environ["HOME"] = tempfile.mkdtemp(prefix="twitterbot-bench-")
+    for key in ("API_KEY", "API_SECRET", "ACCESS_TOKEN_KEY", "ACCESS_TOKEN_SECRET"):
+        os.environ[key] = "fake"
+    if endpoints is not None:
+        transport = local_transport(endpoints)
+        twitterBot.shared_transport = lambda *args, **kwargs: transport
+        auth = tweepy.OAuthHandler("fake", "fake")
+        auth.set_access_token("fake", "fake")
+        api = transport.install(tweepy.API(auth))
+    twitterBot.TwitterBot.connect = lambda self: api
+    bot = twitterBot.TwitterBot(user=user)
+    bot.rate_scheduler = RateScheduler(limits=UNLIMITED)
+    return bot
+
+
+def timed(func, *args, **kwargs) -> tuple:
+    """Returns the result of func and how long it took, in seconds."""
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
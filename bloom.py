@@ -0,0 +1,151 @@
+"""
+Bloom filter of user ids, persisted next to the state database.
+
+The file is a 32 byte little-endian header followed by the bit array:
+
+    magic     4s   b"TBBF"
+    version   H
+    hashes    H    number of bit positions per id
+    bits      Q    size of the bit array
+    capacity  Q    number of ids the filter was sized for
+    count     Q    number of ids in the exact index when the filter was saved
+"""
+import math
+import os
+import pathlib
+import struct
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+MAGIC = b"TBBF"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQQQ")
+MASK = (1 << 64) - 1
+
+
+def _mix(x: int) -> int:
+    """splitmix64 finalizer, spreads consecutive ids over the whole 64 bits."""
+    x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9 & MASK
+    x = (x ^ (x >> 27)) * 0x94D049BB133111EB & MASK
+    return x ^ (x >> 31)
+
+
+def _mix_numpy(x):
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class BloomFilter:
+    """
+    Set of ids answering "definitely not in the set" in O(1), using about
+    1.44 * log2(1 / error_rate) bits per id, and "maybe in the set" otherwise.
+    The bit positions of an id are derived from two 64 bit hashes (double
+    hashing); bulk updates are vectorized with NumPy when it is installed.
+    """
+
+    def __init__(self, capacity: int = 1000000, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.capacity = capacity
+        self.bits = (bits + 7) // 8 * 8
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.array = bytearray(self.bits // 8)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.array)
+
+    def _positions(self, user_id: int):
+        h1 = _mix(int(user_id))
+        h2 = _mix(h1) | 1
+        return [(h1 + i * h2 & MASK) % self.bits for i in range(self.hashes)]
+
+    def add(self, user_id: int) -> None:
+        for position in self._positions(user_id):
+            self.array[position >> 3] |= 1 << (position & 7)
+
+    def update(self, user_ids) -> None:
+        if np is None:
+            for user_id in user_ids:
+                self.add(user_id)
+            return
+        ids = np.fromiter((int(i) for i in user_ids), dtype=np.uint64)
+        h1 = _mix_numpy(ids)
+        h2 = _mix_numpy(h1) | np.uint64(1)
+        bits = np.frombuffer(self.array, dtype=np.uint8)
+        for i in range(self.hashes):
+            positions = (h1 + np.uint64(i) * h2) % np.uint64(self.bits)
+            np.bitwise_or.at(
+                bits,
+                (positions >> np.uint64(3)).astype(np.intp),
+                (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)),
+            )
+
+    def __contains__(self, user_id) -> bool:
+        return all(
+            self.array[position >> 3] & (1 << (position & 7))
+            for position in self._positions(user_id)
+        )
+
+    def save(self, path, count: int) -> None:
+        """Atomically writes the filter, stamped with the size of the exact index."""
+        header = HEADER.pack(
+            MAGIC, VERSION, self.hashes, self.bits, self.capacity, count
+        )
+        tmp_path = pathlib.Path(f"{path}.tmp")
+        with open(tmp_path, "wb") as out_file:
+            out_file.write(header)
+            out_file.write(self.array)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path) -> tuple:
+        """Returns the (BloomFilter, count) saved in path."""
+        with open(path, "rb") as in_file:
+            data = in_file.read(HEADER.size)
+            if len(data) < HEADER.size:
+                raise ValueError(f"Truncated bloom filter: {path}")
+            magic, version, hashes, bits, capacity, count = HEADER.unpack(data)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"Not a version {VERSION} bloom filter: {path}")
+            array = bytearray(in_file.read())
+        if len(array) * 8 != bits:
+            raise ValueError(f"Truncated bloom filter: {path}")
+        bloom = cls.__new__(cls)
+        bloom.capacity = capacity
+        bloom.bits = bits
+        bloom.hashes = hashes
+        bloom.array = array
+        return bloom, count
+
+
+class BloomIndex:
+    """
+    Bloom filter in front of an exact membership test, e.g. a store lookup.
+
+    Ids the filter has never seen are answered from memory, only the possible
+    members are checked against the exact index.
+    """
+
+    def __init__(self, bloom: BloomFilter, exact):
+        self.bloom = bloom
+        self.exact = exact
+        # ids added since the filter was last saved
+        self.dirty = 0
+        self.checks = 0
+        self.exact_checks = 0
+
+    def __contains__(self, user_id) -> bool:
+        self.checks += 1
+        if user_id not in self.bloom:
+            return False
+        self.exact_checks += 1
+        return self.exact(user_id)
+
+    def add(self, user_id: int) -> None:
+        self.bloom.add(user_id)
+        self.dirty += 1
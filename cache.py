@@ -0,0 +1,100 @@
+import threading
+import time
+
+from collections import OrderedDict, namedtuple
+
+from loguru import logger
+
+from storage import USER_FIELDS
+
+# Lightweight stand-in for a tweepy User holding only the cached profile fields.
+CachedUser = namedtuple("CachedUser", USER_FIELDS)
+
+
+def to_cached_user(user_obj: object) -> CachedUser:
+    return CachedUser(*(getattr(user_obj, field, None) for field in USER_FIELDS))
+
+
+def from_row(row: tuple) -> CachedUser:
+    """Builds a CachedUser from a stored row, restoring the boolean fields."""
+    user = CachedUser(*row)
+    return user._replace(
+        protected=bool(user.protected),
+        verified=bool(user.verified),
+        following=bool(user.following),
+    )
+
+
+class UserCache:
+    """
+    Profile cache keyed by user id, in front of the users/lookup endpoint.
+
+    Entries expire after `ttl` seconds, the most recently used `max_size` entries
+    are kept in memory and every entry is persisted in the store so it survives
+    across runs. The cache is thread-safe so it can be shared by several bots.
+    """
+
+    def __init__(
+        self, store, ttl: float = 86400, max_size: int = 100000, _logger=logger
+    ):
+        self.store = store
+        self.ttl = ttl
+        self.max_size = max_size
+        self.logger = _logger
+        # user id -> (fetched_at, CachedUser), least recently used first
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self.store.delete_users(fetched_before=time.time() - ttl)
+
+    def _remember(self, user: CachedUser, fetched_at: float) -> None:
+        self._entries[user.id] = (fetched_at, user)
+        self._entries.move_to_end(user.id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get_many(self, ids: list) -> tuple:
+        """Returns the cached users of ids and the list of ids missing from the cache."""
+        with self._lock:
+            return self._get_many(ids)
+
+    def _get_many(self, ids: list) -> tuple:
+        now = time.time()
+        users, missing = [], []
+        for user_id in ids:
+            entry = self._entries.get(user_id)
+            if entry and now - entry[0] < self.ttl:
+                self._entries.move_to_end(user_id)
+                users.append(entry[1])
+            else:
+                missing.append(user_id)
+
+        if missing:
+            found = set()
+            for row in self.store.get_users(missing, fetched_after=now - self.ttl):
+                user = from_row(row[:-1])
+                self._remember(user, row[-1])
+                users.append(user)
+                found.add(user.id)
+            missing = [user_id for user_id in missing if user_id not in found]
+
+        self.hits += len(users)
+        self.misses += len(missing)
+        return users, missing
+
+    def put_many(self, user_objs) -> list:
+        """Caches hydrated users and returns their cached copies."""
+        now = time.time()
+        users = [to_cached_user(user_obj) for user_obj in user_objs]
+        with self._lock:
+            for user in users:
+                self._remember(user, now)
+            self.store.put_users(users, fetched_at=now)
+        return users
+
+    def invalidate(self, user_id: int) -> None:
+        """Drops a user whose relationship changed, e.g. after a follow."""
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self.store.delete_users([user_id])
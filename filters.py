@@ -0,0 +1,289 @@
+import configparser
+import math
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+BOOLEAN_STATES = configparser.ConfigParser.BOOLEAN_STATES
+
+
+def ff_ratio(followers_count: int, friends_count: int) -> float:
+    """Followers/friends ratio, infinite for users that follow no-one."""
+    return followers_count / friends_count if friends_count else math.inf
+
+
+def _minimum(column: str, attr: str):
+    """Rejects users whose column is below the threshold, disabled at 0."""
+
+    def compile_rule(rule_filter):
+        threshold = getattr(rule_filter, attr)
+        if not threshold or threshold <= 0:
+            return None
+        return lambda c: c[column] < threshold
+
+    return compile_rule
+
+
+def _flag(column: str, attr: str = None):
+    """Rejects users whose column is set, unless the filter attr allows them."""
+
+    def compile_rule(rule_filter):
+        if attr and getattr(rule_filter, attr):
+            return None
+        return lambda c: c[column]
+
+    return compile_rule
+
+
+def _ratio(rule_filter):
+    low, high = rule_filter.followers_follow_ratio
+    return lambda c: (c["ratio"] < low) | (c["ratio"] > high)
+
+
+def _required(column: str, attr: str):
+    """Rejects users whose column is set when the filter attr requires it."""
+
+    def compile_rule(rule_filter):
+        if not getattr(rule_filter, attr):
+            return None
+        return lambda c: c[column]
+
+    return compile_rule
+
+
+class RuleFilter:
+    """
+    Screens users against a table of rules, one user or a batch at a time.
+
+    RULES holds (rejection reason, rule factory) pairs. Factories are compiled
+    once with the filter's thresholds into predicates that receive the user
+    columns and return True for rejected users, or None when the rule is
+    disabled. Predicates only use comparison and `|`/`&` operators so the same
+    rule works on scalars (one user) and on NumPy arrays (a whole batch).
+
+    Single user checks short-circuit on the first rejecting rule. The rules are
+    periodically reordered by their observed rejection rate so the most
+    selective run first, and per-rule counters are kept in `stats()`.
+    """
+
+    RULES = ()
+    # (config key, attribute, parser) of the rule thresholds
+    SETTINGS = ()
+    # prefix of the rule settings in config.ini, e.g. "follow_min_followers"
+    PREFIX = ""
+
+    def __init__(self, reorder_every: int = 1000):
+        self.reorder_every = reorder_every
+        self.compile()
+
+    @classmethod
+    def from_settings(cls, settings: dict, **kwargs) -> "RuleFilter":
+        """
+        Builds a filter from "<prefix>_<key>" entries of the bot settings, or from
+        the [<prefix>] section of the ini file named by the rules_file setting.
+        """
+        values = {}
+        if settings.get("rules_file"):
+            rules = configparser.ConfigParser()
+            rules.read(settings["rules_file"])
+            if rules.has_section(cls.PREFIX):
+                values.update(rules.items(cls.PREFIX))
+        for key, _, _ in cls.SETTINGS:
+            if settings.get(f"{cls.PREFIX}_{key}") is not None:
+                values[key] = settings[f"{cls.PREFIX}_{key}"]
+        for key, attr, parse in cls.SETTINGS:
+            if key in values:
+                kwargs.setdefault(attr, parse(values[key]))
+        return cls(**kwargs)
+
+    def replace(self, **kwargs) -> "RuleFilter":
+        """Returns a copy of the filter with some thresholds changed."""
+        params = {
+            key: value
+            for key, value in vars(self).items()
+            if key not in ("pipeline", "checked")
+        }
+        return type(self)(**{**params, **kwargs})
+
+    def compile(self) -> None:
+        # [reason, predicate, evaluated, rejected] of every enabled rule
+        self.pipeline = []
+        for reason, compile_rule in self.RULES:
+            predicate = compile_rule(self)
+            if predicate is not None:
+                self.pipeline.append([reason, predicate, 0, 0])
+        self.checked = 0
+
+    def reorder(self) -> None:
+        """Runs the rules with the highest observed rejection rate first."""
+        self.pipeline.sort(key=lambda rule: -rule[3] / rule[2] if rule[2] else 0)
+
+    def stats(self) -> dict:
+        """Returns how many users each rule evaluated and rejected."""
+        return {
+            reason: {
+                "evaluated": evaluated,
+                "rejected": rejected,
+                "rate": rejected / evaluated if evaluated else 0.0,
+            }
+            for reason, _, evaluated, rejected in self.pipeline
+        }
+
+    def user_columns(self, user_obj: object) -> dict:
+        raise NotImplementedError
+
+    def batch_columns(self, users: list) -> dict:
+        """Returns the columns of a batch of users as NumPy arrays."""
+        rows = [self.user_columns(user_obj) for user_obj in users]
+        return {key: np.array([row[key] for row in rows]) for key in rows[0]}
+
+    def check(self, user_obj: object):
+        """Returns the reason user_obj is rejected, None if it is accepted."""
+        columns = self.user_columns(user_obj)
+        self.checked += 1
+        if self.checked % self.reorder_every == 0:
+            self.reorder()
+        for rule in self.pipeline:
+            rule[2] += 1
+            if rule[1](columns):
+                rule[3] += 1
+                return rule[0]
+        return None
+
+    def screen(self, users: list) -> tuple:
+        """
+        Screens a batch of users in one pass over columnar arrays.
+
+        Returns the accept mask and, per user, the first rule that rejected it
+        (None when accepted). Falls back to per-user checks without NumPy.
+        """
+        users = list(users)
+        if np is None or not users:
+            reasons = [self.check(user_obj) for user_obj in users]
+            return [reason is None for reason in reasons], reasons
+
+        columns = self.batch_columns(users)
+        rejected = np.zeros(len(users), dtype=bool)
+        reasons = np.full(len(users), None, dtype=object)
+        for rule in self.pipeline:
+            hits = np.asarray(rule[1](columns), dtype=bool) & ~rejected
+            rule[2] += int(len(users) - rejected.sum())
+            rule[3] += int(hits.sum())
+            reasons[hits] = rule[0]
+            rejected |= hits
+        # the next batch runs the rules in the order this one observed
+        checked, self.checked = self.checked, self.checked + len(users)
+        if checked // self.reorder_every != self.checked // self.reorder_every:
+            self.reorder()
+        return (~rejected).tolist(), reasons.tolist()
+
+
+def _parse_ratio(value) -> tuple:
+    if isinstance(value, str):
+        value = value.split(",")
+    low, high = (float(i) for i in value)
+    return low, high
+
+
+def _parse_bool(value) -> bool:
+    if isinstance(value, str):
+        return BOOLEAN_STATES[value.strip().lower()]
+    return bool(value)
+
+
+class CandidateFilter(RuleFilter):
+    """Follow rules applied to every candidate before following it."""
+
+    RULES = (
+        ("self", _flag("is_self")),
+        ("ratio", _ratio),
+        ("followers", _minimum("followers_count", "n_followers")),
+        ("tweets", _minimum("statuses_count", "n_tweets")),
+        ("friends", _minimum("friends_count", "n_friends")),
+        ("protected", _flag("protected")),
+        ("following", _flag("following")),
+        ("profile_image", _required("no_profile_image", "require_profile_image")),
+    )
+    SETTINGS = (
+        ("min_followers", "n_followers", int),
+        ("ratio", "followers_follow_ratio", _parse_ratio),
+        ("min_tweets", "n_tweets", int),
+        ("min_friends", "n_friends", int),
+        ("require_profile_image", "require_profile_image", _parse_bool),
+    )
+    PREFIX = "follow"
+
+    def __init__(
+        self,
+        twitter_handle: str = None,
+        n_followers: int = 100,
+        followers_follow_ratio: tuple = (0.6, 1.4),
+        n_tweets: int = 100,
+        n_friends: int = 0,
+        require_profile_image: bool = False,
+        reorder_every: int = 1000,
+    ):
+        self.twitter_handle = twitter_handle
+        self.n_followers = n_followers
+        self.followers_follow_ratio = followers_follow_ratio
+        self.n_tweets = n_tweets
+        self.n_friends = n_friends
+        self.require_profile_image = require_profile_image
+        super().__init__(reorder_every=reorder_every)
+
+    def user_columns(self, user_obj: object) -> dict:
+        followers_count = user_obj.followers_count or 0
+        friends_count = user_obj.friends_count or 0
+        return {
+            "is_self": user_obj.screen_name == self.twitter_handle,
+            "followers_count": followers_count,
+            "friends_count": friends_count,
+            "statuses_count": user_obj.statuses_count or 0,
+            "ratio": ff_ratio(followers_count, friends_count),
+            "protected": bool(user_obj.protected),
+            "following": bool(user_obj.following),
+            "no_profile_image": not getattr(user_obj, "profile_image_url", None),
+        }
+
+    def batch_columns(self, users: list) -> dict:
+        columns = super().batch_columns(users)
+        followers = columns["followers_count"].astype(float)
+        friends = columns["friends_count"].astype(float)
+        columns["ratio"] = np.divide(
+            followers, friends, out=np.full(len(users), np.inf), where=friends > 0
+        )
+        return columns
+
+
+class UnfollowFilter(RuleFilter):
+    """Rules protecting the users that unfollow_user must keep following."""
+
+    RULES = (
+        ("not_following", _flag("not_following")),
+        ("verified", _flag("verified", "unfollow_verified")),
+        ("protected", _flag("protected", "unfollow_protected")),
+    )
+    SETTINGS = (
+        ("verified", "unfollow_verified", _parse_bool),
+        ("protected", "unfollow_protected", _parse_bool),
+    )
+    PREFIX = "unfollow"
+
+    def __init__(
+        self,
+        unfollow_verified: bool = False,
+        unfollow_protected: bool = False,
+        reorder_every: int = 1000,
+    ):
+        self.unfollow_verified = unfollow_verified
+        self.unfollow_protected = unfollow_protected
+        super().__init__(reorder_every=reorder_every)
+
+    def user_columns(self, user_obj: object) -> dict:
+        return {
+            "not_following": not user_obj.following,
+            "verified": bool(user_obj.verified),
+            "protected": bool(user_obj.protected),
+        }
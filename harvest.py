@@ -0,0 +1,61 @@
+from loguru import logger
+
+
+class AuthorHarvest:
+    """
+    Merges the search results of several phrases into one stream of authors,
+    each author once, keyed by user id.
+
+    The newest tweet id seen for a phrase is stored (as its since_id) once all the
+    pages of the phrase were read, so its next search only fetches newer tweets.
+    Per-phrase counts of the pages, tweets, new authors and follows they led to
+    are kept in `stats` to show which phrases are worth their search budget.
+    """
+
+    def __init__(self, store, phrases: list, _logger=logger):
+        self.store = store
+        self.phrases = list(dict.fromkeys(phrases))
+        self.logger = _logger
+        # user id -> phrase whose search found the user first
+        self.origin = {}
+        self.newest = {}
+        self.stats = {
+            phrase: {"pages": 0, "tweets": 0, "authors": 0, "followed": 0}
+            for phrase in self.phrases
+        }
+
+    @staticmethod
+    def key(phrase: str) -> str:
+        return f"since_id:{phrase.lower()}"
+
+    def since_id(self, phrase: str):
+        return self.store.get_meta(self.key(phrase))
+
+    def add_page(self, phrase: str, page: list) -> list:
+        """Returns the authors of page that no phrase has found yet."""
+        stats = self.stats[phrase]
+        stats["pages"] += 1
+        stats["tweets"] += len(page)
+        self.newest[phrase] = max(self.newest.get(phrase, 0), max(i.id for i in page))
+        users = []
+        for tweet in page:
+            if tweet.user.id not in self.origin:
+                self.origin[tweet.user.id] = phrase
+                users.append(tweet.user)
+        stats["authors"] += len(users)
+        return users
+
+    def finish(self, phrase: str) -> None:
+        """Stores the since_id of a phrase whose pages were all read."""
+        if self.newest.get(phrase):
+            self.store.set_meta(self.key(phrase), self.newest[phrase])
+
+    def followed(self, user_id: int) -> None:
+        self.stats[self.origin[user_id]]["followed"] += 1
+
+    def log_stats(self) -> None:
+        for phrase, stats in self.stats.items():
+            self.logger.info(
+                f"{phrase!r}: {stats['pages']} pages, {stats['tweets']} tweets, "
+                f"{stats['authors']} new authors, {stats['followed']} followed."
+            )
@@ -0,0 +1,167 @@
+from array import array
+from bisect import bisect_left
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+
+def _to_numpy(ids):
+    return np.frombuffer(ids, dtype=np.uint64) if len(ids) else np.empty(0, np.uint64)
+
+
+def _from_numpy(values) -> array:
+    ids = array("Q")
+    ids.frombytes(values.astype(np.uint64).tobytes())
+    return ids
+
+
+def merge_union(a, b) -> array:
+    """Union of two sorted id sequences."""
+    if np is not None:
+        # a stable sort of two sorted runs is a linear merge, unlike np.union1d
+        # whose np.unique hashes every id
+        ids = np.concatenate((_to_numpy(a), _to_numpy(b)))
+        ids.sort(kind="stable")
+        return _from_numpy(ids[np.concatenate(([True], ids[1:] != ids[:-1]))])
+    out = array("Q")
+    i, j, len_a, len_b = 0, 0, len(a), len(b)
+    while i < len_a and j < len_b:
+        if a[i] < b[j]:
+            out.append(a[i])
+            i += 1
+        elif b[j] < a[i]:
+            out.append(b[j])
+            j += 1
+        else:
+            out.append(a[i])
+            i += 1
+            j += 1
+    out.extend(a[i:])
+    out.extend(b[j:])
+    return out
+
+
+def merge_difference(a, b) -> array:
+    """Ids of sorted sequence a that are not in sorted sequence b."""
+    if np is not None:
+        return _from_numpy(
+            np.setdiff1d(_to_numpy(a), _to_numpy(b), assume_unique=True)
+        )
+    out = array("Q")
+    j, len_b = 0, len(b)
+    for x in a:
+        while j < len_b and b[j] < x:
+            j += 1
+        if j == len_b or b[j] != x:
+            out.append(x)
+    return out
+
+
+def merge_intersection(a, b) -> array:
+    """Ids present in both sorted sequences."""
+    if np is not None:
+        return _from_numpy(
+            np.intersect1d(_to_numpy(a), _to_numpy(b), assume_unique=True)
+        )
+    out = array("Q")
+    j, len_b = 0, len(b)
+    for x in a:
+        while j < len_b and b[j] < x:
+            j += 1
+        if j < len_b and b[j] == x:
+            out.append(x)
+    return out
+
+
+class IdSet:
+    """
+    Compact set of Twitter ids, stored as a sorted array of uint64 (8 bytes per
+    id instead of the ~70 bytes of an int in a builtin set).
+
+    Membership is a binary search and union/difference/intersection are merges
+    of the sorted arrays (vectorized with NumPy when it is installed). Single
+    ids added with add() are buffered and merged in bulk.
+    """
+
+    __slots__ = ("_ids", "_pending", "merge_every")
+
+    def __init__(self, ids=(), merge_every: int = 4096):
+        self._ids = array("Q", sorted(set(ids)))
+        self._pending = set()
+        self.merge_every = merge_every
+
+    @classmethod
+    def from_sorted(cls, ids) -> "IdSet":
+        """
+        Wraps ids that are already sorted and unique (e.g. ORDER BY id). Arrays and
+        "Q" memoryviews (e.g. of a memory-mapped snapshot) are used without a copy.
+        """
+        id_set = cls()
+        id_set._ids = ids if isinstance(ids, (array, memoryview)) else array("Q", ids)
+        return id_set
+
+    def _merge_pending(self) -> None:
+        if self._pending:
+            self._ids = merge_union(self._ids, array("Q", sorted(self._pending)))
+            self._pending.clear()
+
+    @property
+    def ids(self):
+        """The sorted ids as an array('Q') (or a "Q" memoryview)."""
+        self._merge_pending()
+        return self._ids
+
+    @property
+    def nbytes(self) -> int:
+        return self.ids.itemsize * len(self._ids)
+
+    def __contains__(self, user_id) -> bool:
+        if user_id in self._pending:
+            return True
+        ids = self._ids
+        i = bisect_left(ids, user_id)
+        return i < len(ids) and ids[i] == user_id
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, IdSet):
+            return self.ids == other.ids
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"IdSet({len(self)} ids)"
+
+    def add(self, user_id: int) -> None:
+        if user_id not in self:
+            self._pending.add(user_id)
+            if len(self._pending) >= self.merge_every:
+                self._merge_pending()
+
+    def update(self, user_ids) -> None:
+        self._ids = merge_union(self.ids, array("Q", sorted(set(user_ids))))
+
+    def union(self, other) -> "IdSet":
+        return IdSet.from_sorted(merge_union(self.ids, _sorted_ids(other)))
+
+    def difference(self, other) -> "IdSet":
+        return IdSet.from_sorted(merge_difference(self.ids, _sorted_ids(other)))
+
+    def intersection(self, other) -> "IdSet":
+        return IdSet.from_sorted(merge_intersection(self.ids, _sorted_ids(other)))
+
+    __or__ = union
+    __sub__ = difference
+    __and__ = intersection
+
+
+def _sorted_ids(other) -> array:
+    if isinstance(other, IdSet):
+        return other.ids
+    return array("Q", sorted(set(other)))
@@ -0,0 +1,64 @@
+import threading
+import time
+
+from loguru import logger
+
+
+class StalenessMonitor:
+    """
+    Warns when the follower sync is older than `max_age` seconds.
+
+    The age is computed from the time of the last sync kept in memory, once at
+    start() and then every `interval` seconds on a daemon thread, so nothing is
+    checked on the API call path. The warning is only logged once per sync.
+    """
+
+    def __init__(
+        self,
+        synced_at: float,
+        max_age: float = 86400,
+        interval: float = 3600,
+        clock=time.time,
+        _logger=logger,
+    ):
+        self.synced_at = synced_at
+        self.max_age = max_age
+        self.interval = interval
+        self.clock = clock
+        self.logger = _logger
+        self.stale = False
+        # sync time the warning was last logged for
+        self._warned_for = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def check(self) -> bool:
+        """Returns whether the sync is stale, warning the first time it is."""
+        self.stale = self.clock() - self.synced_at > self.max_age
+        if self.stale and self._warned_for != self.synced_at:
+            self._warned_for = self.synced_at
+            self.logger.warning(
+                "Your Twitter follower sync data is more than "
+                f"{self.max_age / 3600:g} hours old. "
+                "It is highly recommended that you sync them by calling sync_follows() "
+                "before continuing."
+            )
+        return self.stale
+
+    def synced(self, synced_at: float) -> None:
+        """Records a completed sync."""
+        self.synced_at = synced_at
+        self.stale = False
+
+    def start(self) -> None:
+        self.check()
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.check()
+
+    def stop(self) -> None:
+        self._stopped.set()
@@ -0,0 +1,72 @@
+import math
+
+
+class CandidatePipeline:
+    """
+    Stages a stream of follow candidates goes through, with counters per stage.
+
+    `known` is a tuple of in-memory id sets (ignored users, users followed in the
+    past, follows) checked before any other work: on ids before they are looked
+    up (unknown_ids()) and on batches of users before they are followed
+    (admit()). `candidate_filter` screens the remaining users of a batch at once
+    and `on_reject(user_obj, reason)` is called for the rejected ones. The caller
+    follows the users admitted and reports them with followed().
+
+    The lookup calls (one per 100 ids) and follow calls avoided by dropping the
+    known ids are counted in saved_lookups and saved_follows.
+    """
+
+    COUNTERS = (
+        "ids",
+        "unknown_ids",
+        "candidates",
+        "unknown",
+        "accepted",
+        "followed",
+        "saved_lookups",
+        "saved_follows",
+    )
+
+    def __init__(self, known: tuple, candidate_filter, on_reject=None):
+        self.known = known
+        self.candidate_filter = candidate_filter
+        self.on_reject = on_reject
+        self.counts = dict.fromkeys(self.COUNTERS, 0)
+
+    def is_known(self, user_id: int) -> bool:
+        return any(user_id in ids for ids in self.known)
+
+    def unknown_ids(self, ids: list) -> list:
+        """Drops the known ids of a batch before their users are looked up."""
+        unknown = [user_id for user_id in ids if not self.is_known(user_id)]
+        self.counts["ids"] += len(ids)
+        self.counts["unknown_ids"] += len(unknown)
+        self.counts["saved_lookups"] += math.ceil(len(ids) / 100) - math.ceil(
+            len(unknown) / 100
+        )
+        return unknown
+
+    def admit(self, users: list) -> list:
+        """
+        Returns the users of a batch that should be followed. The unknown users
+        are screened by the candidate filter in one pass.
+        """
+        unknown = [user_obj for user_obj in users if not self.is_known(user_obj.id)]
+        self.counts["candidates"] += len(users)
+        self.counts["saved_follows"] += len(users) - len(unknown)
+        self.counts["unknown"] += len(unknown)
+        admitted = []
+        accepted, reasons = self.candidate_filter.screen(unknown)
+        for user_obj, accept, reason in zip(unknown, accepted, reasons):
+            if accept:
+                admitted.append(user_obj)
+            elif self.on_reject is not None:
+                self.on_reject(user_obj, reason)
+        self.counts["accepted"] += len(admitted)
+        return admitted
+
+    def followed(self) -> None:
+        self.counts["followed"] += 1
+
+    def stats(self) -> dict:
+        return dict(self.counts)
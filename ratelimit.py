@@ -0,0 +1,163 @@
+import random
+import threading
+import time
+
+from loguru import logger
+
+# Request budgets per endpoint as (requests, window in seconds), see
+# https://developer.twitter.com/en/docs/twitter-api/v1/rate-limits
+DEFAULT_LIMITS = {
+    "follow": (400, 86400),
+    "unfollow": (400, 86400),
+    "delete": (300, 900),
+    "lookup": (900, 900),
+    "followers_ids": (15, 900),
+    "friends_ids": (15, 900),
+    "search": (180, 900),
+    "default": (15, 900),
+}
+
+
+class TokenBucket:
+    """
+    Token bucket holding up to `capacity` requests, refilled at capacity/period
+    tokens per second.
+
+    The clock is injectable so the bucket can be driven by a simulated clock.
+    """
+
+    def __init__(self, capacity: int, period: float, clock=time.time):
+        self.capacity = capacity
+        self.period = period
+        self.rate = capacity / period
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated = clock()
+        # epoch until which the server reported the window as exhausted
+        self.blocked_until = 0.0
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Takes a token and returns how long to wait before it may be used."""
+        now = self.clock()
+        self.refill(now)
+        self.tokens -= 1
+        delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(delay, self.blocked_until - now)
+
+    def update(self, remaining: int, reset: float) -> None:
+        """Syncs the bucket with the remaining/reset values reported by the API."""
+        now = self.clock()
+        self.refill(now)
+        self.tokens = min(self.tokens, remaining)
+        self.blocked_until = reset if remaining <= 0 else 0.0
+
+
+class RateScheduler:
+    """
+    Paces API calls with one token bucket per endpoint.
+
+    The buckets of windows of at least `persist_after` seconds (the daily follow
+    and unfollow budgets) are saved in the meta table of `store` and restored by
+    the next run, so that each run does not start with a full window.
+    """
+
+    def __init__(
+        self,
+        limits: dict = None,
+        jitter: tuple = (0, 0),
+        clock=time.time,
+        sleep=time.sleep,
+        store=None,
+        persist_after: float = 3600,
+        _logger=logger,
+    ):
+        self.limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.jitter = jitter
+        self.clock = clock
+        self.sleep = sleep
+        self.store = store
+        self.persist_after = persist_after
+        self.logger = _logger
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, endpoint: str) -> TokenBucket:
+        if endpoint not in self.buckets:
+            capacity, period = self.limits.get(endpoint, self.limits["default"])
+            bucket = TokenBucket(capacity, period, clock=self.clock)
+            if self.persistent(bucket):
+                self.restore(endpoint, bucket)
+            self.buckets[endpoint] = bucket
+        return self.buckets[endpoint]
+
+    def persistent(self, bucket: TokenBucket) -> bool:
+        return self.store is not None and bucket.period >= self.persist_after
+
+    def restore(self, endpoint: str, bucket: TokenBucket) -> None:
+        """Loads the state of bucket saved by a previous run, if any."""
+        state = self.store.get_meta(f"rate_limit:{endpoint}")
+        if not state:
+            return
+        try:
+            tokens, updated, blocked_until = (float(i) for i in state.split(","))
+        except ValueError:
+            self.logger.warning(f"Ignoring the saved {endpoint} rate limit: {state!r}")
+            return
+        bucket.tokens = min(bucket.capacity, tokens)
+        bucket.updated = min(updated, bucket.updated)
+        bucket.blocked_until = blocked_until
+        bucket.refill(self.clock())
+
+    def save(self, endpoint: str, bucket: TokenBucket) -> None:
+        self.store.set_meta(
+            f"rate_limit:{endpoint}",
+            f"{bucket.tokens},{bucket.updated},{bucket.blocked_until}",
+        )
+
+    def reserve(self, endpoint: str = "default") -> float:
+        """Reserves a request on endpoint and returns the delay before sending it."""
+        with self._lock:
+            bucket = self.bucket(endpoint)
+            delay = bucket.reserve()
+            if self.persistent(bucket):
+                self.save(endpoint, bucket)
+        if self.jitter[1] > 0:
+            delay += random.uniform(*self.jitter)
+        return delay
+
+    def acquire(self, endpoint: str = "default") -> float:
+        """Blocks until a request on endpoint is allowed, returns the time slept."""
+        delay = self.reserve(endpoint)
+        if delay > 0:
+            self.logger.debug(f"sleeping for {delay:.2f} seconds before {endpoint}.")
+            self.sleep(delay)
+        return delay
+
+    def update_from_headers(self, endpoint: str, headers) -> None:
+        """Reads the x-rate-limit-remaining/reset headers of an API response."""
+        if not headers:
+            return
+        remaining = headers.get("x-rate-limit-remaining")
+        reset = headers.get("x-rate-limit-reset")
+        if remaining is None or reset is None:
+            return
+        with self._lock:
+            bucket = self.bucket(endpoint)
+            bucket.update(int(remaining), float(reset))
+            if self.persistent(bucket):
+                self.save(endpoint, bucket)
+
+
+def parse_limits(settings: dict) -> dict:
+    """Reads "<endpoint>_rate_limit = requests/seconds" overrides from settings."""
+    limits = {}
+    for endpoint in DEFAULT_LIMITS:
+        value = settings.get(f"{endpoint}_rate_limit")
+        if value:
+            requests, period = str(value).split("/")
+            limits[endpoint] = (int(requests), float(period))
+    return limits
@@ -0,0 +1,132 @@
+import heapq
+import pathlib
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from loguru import logger
+
+from cache import UserCache
+from settings import list_accounts
+from storage import StateStore
+from twitterBot import TwitterBot
+
+
+class MultiAccountRunner:
+    """
+    Runs the bots of several Twitter handles from a single process.
+
+    Every handle gets its own TwitterBot, and with it its own database and rate
+    limits, while the user profile cache is shared by all of them. The jobs of
+    a handle run one after the other, different handles run concurrently.
+    """
+
+    def __init__(self, handles: list = None, config_dir=".tweeterbot", _logger=logger):
+        self.logger = _logger
+        config_path = pathlib.Path.home().joinpath(config_dir)
+        if handles is None:
+            handles = list_accounts(config_path.joinpath("config.ini"))
+        self.user_cache = UserCache(
+            StateStore(config_path.joinpath("users.db"), _logger=_logger),
+            _logger=_logger,
+        )
+        self.bots = {
+            handle: TwitterBot(logger=_logger, user=handle, user_cache=self.user_cache)
+            for handle in handles
+        }
+
+    def run_account(self, handle: str, jobs: list) -> dict:
+        """Runs jobs, a list of (TwitterBot method name, kwargs), for one handle."""
+        bot = self.bots[handle]
+        results = {}
+        for name, kwargs in jobs:
+            self.logger.info(f"Running {name} for {handle!r}.")
+            try:
+                results[name] = getattr(bot, name)(**kwargs)
+            except Exception:
+                self.logger.exception(f"{name} failed for {handle!r}.")
+        return results
+
+    def run(self, jobs: list, workers: int = None) -> dict:
+        """Runs jobs for every handle concurrently, returns the results per handle."""
+        with ThreadPoolExecutor(max_workers=workers or len(self.bots) or 1) as executor:
+            futures = {
+                handle: executor.submit(self.run_account, handle, jobs)
+                for handle in self.bots
+            }
+        results = {handle: future.result() for handle, future in futures.items()}
+        self.log_transport_stats()
+        return results
+
+    def log_transport_stats(self) -> None:
+        # the transport is shared, every bot holds the same one
+        for bot in self.bots.values():
+            bot.transport.log_stats()
+            break
+
+    def run_forever(self, jobs: list) -> None:
+        """Runs jobs on their intervals for every handle until interrupted."""
+        Daemon(self.bots, jobs, _logger=self.logger).run()
+
+
+class Daemon:
+    """
+    Runs the jobs of long-lived bots on fixed intervals.
+
+    jobs is a list of (TwitterBot method name, kwargs, interval setting, default
+    interval in seconds); the interval of each handle is read from its settings.
+    The jobs of a handle never overlap: they are sequenced on one thread per
+    handle, in list order when several are due, and the next run of a job is
+    scheduled an interval after the previous one finished. The bots, their API
+    connection and their id sets stay in memory between runs.
+    """
+
+    def __init__(self, bots: dict, jobs: list, _logger=logger):
+        self.bots = bots
+        self.jobs = jobs
+        self.logger = _logger
+        self.stopped = threading.Event()
+
+    def interval(self, bot, job: tuple) -> float:
+        _, _, key, default = job
+        return float(bot.default_settings.get(key, default))
+
+    def run_bot(self, handle: str) -> None:
+        bot = self.bots[handle]
+        now = time.time()
+        schedule = [(now, index) for index in range(len(self.jobs))]
+        while schedule:
+            due, index = heapq.heappop(schedule)
+            if self.stopped.wait(max(0.0, due - time.time())):
+                return
+            name, kwargs, _, _ = self.jobs[index]
+            self.logger.info(f"Running {name} for {handle!r}.")
+            try:
+                getattr(bot, name)(**kwargs)
+            except Exception:
+                self.logger.exception(f"{name} failed for {handle!r}.")
+            bot.transport.log_stats()
+            next_run = time.time() + self.interval(bot, self.jobs[index])
+            heapq.heappush(schedule, (next_run, index))
+
+    def run(self) -> None:
+        """Runs until stop() is called or the process is interrupted."""
+        threads = [
+            threading.Thread(target=self.run_bot, args=(handle,), daemon=True)
+            for handle in self.bots
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            self.stop()
+            for thread in threads:
+                thread.join()
+
+    def stop(self) -> None:
+        self.logger.info("Stopping daemon, waiting for running jobs to finish.")
+        self.stopped.set()
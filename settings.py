@@ -4,6 +4,22 @@ from collections import defaultdict, OrderedDict
 
 from loguru import logger
 
+# Files holding the state of a single handle, named after the handle. They are
+# never written to the DEFAULT section, which every handle's section inherits.
+HANDLE_FILES = {
+    "database_file": "{}.db",
+    "followers_snapshot_file": "{}-followers.bin",
+    "follows_snapshot_file": "{}-following.bin",
+    "ignored_bloom_file": "{}-ignored.bloom",
+}
+
+
+def list_accounts(filename) -> list:
+    """Returns the handles of every account section of the config file."""
+    config = configparser.ConfigParser()
+    config.read(filename)
+    return [section.lower() for section in config.sections()]
+
 
 class ConfigSettings:
     def __init__(self, filename=None, user=None, _logger=logger):
@@ -47,13 +63,27 @@ class ConfigSettings:
                 config.items(config.sections()[sections_lower.index(self.user)])
             )
 
+            # handle files inherited from DEFAULT belong to another handle
+            for key in HANDLE_FILES:
+                if _default_settings.get(key) == config.defaults().get(key):
+                    _default_settings.pop(key, None)
+
             if _default_settings != self.default_settings:
                 # If dictionaries are not the same, merge them.
                 self.default_settings = {**self.default_settings, **_default_settings}
             else:
                 self.default_settings = _default_settings
+        self.add_handle_files()
         self.check_files_lookup()
 
+    def add_handle_files(self):
+        """Names the state files of the handle that its section does not set."""
+        handle = self.user or "twitterbot"
+        for key, name in HANDLE_FILES.items():
+            self.default_settings.setdefault(
+                key, self.filename.parent.joinpath(name.format(handle))
+            )
+
     def create_config(self):
         self.logger.info("Creating the tweeterbot config file.")
         msg = (
@@ -0,0 +1,111 @@
+"""
+Binary snapshots of id lists.
+
+A snapshot is a 32 byte little-endian header followed by the ids as sorted
+little-endian uint64:
+
+    magic     4s   b"TBID"
+    version   H
+    reserved  H
+    count     Q    number of ids
+    synced_at d    unix time of the sync the ids come from
+    checksum  I    CRC-32 of the id payload
+    padding   4x
+
+The header keeps the payload 8 byte aligned, so it can be memory-mapped and
+used in place (memoryview.cast("Q") or numpy.frombuffer) without copying.
+"""
+import mmap
+import os
+import pathlib
+import struct
+import sys
+import time
+import zlib
+
+from array import array
+
+from idset import IdSet
+
+MAGIC = b"TBID"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQdI4x")
+
+
+def _little_endian(ids: array) -> array:
+    if sys.byteorder == "big":
+        ids = array("Q", ids)
+        ids.byteswap()
+    return ids
+
+
+def write_snapshot(path, ids, synced_at: float = None) -> int:
+    """Atomically writes ids (an IdSet or any iterable of ids) to path."""
+    if not isinstance(ids, IdSet):
+        ids = IdSet(ids)
+    payload = _little_endian(ids.ids)
+    synced_at = time.time() if synced_at is None else synced_at
+    header = HEADER.pack(
+        MAGIC, VERSION, 0, len(payload), synced_at, zlib.crc32(payload)
+    )
+    tmp_path = pathlib.Path(f"{path}.tmp")
+    with open(tmp_path, "wb") as out_file:
+        out_file.write(header)
+        payload.tofile(out_file)
+    os.replace(tmp_path, path)
+    return len(payload)
+
+
+def read_header(path) -> tuple:
+    """Returns the (count, synced_at, checksum) of a snapshot."""
+    with open(path, "rb") as in_file:
+        return _unpack_header(in_file.read(HEADER.size), path)
+
+
+def _unpack_header(data: bytes, path) -> tuple:
+    if len(data) < HEADER.size:
+        raise ValueError(f"Truncated snapshot: {path}")
+    magic, version, _, count, synced_at, checksum = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Not a version {VERSION} id snapshot: {path}")
+    return count, synced_at, checksum
+
+
+def read_snapshot(path, verify: bool = True) -> tuple:
+    """
+    Memory-maps a snapshot and returns (IdSet, synced_at).
+
+    On little-endian machines the IdSet uses the mapped payload in place.
+    """
+    with open(path, "rb") as in_file:
+        if os.fstat(in_file.fileno()).st_size <= HEADER.size:
+            count, synced_at, _ = _unpack_header(in_file.read(), path)
+            return IdSet(), synced_at
+        mapped = mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    count, synced_at, checksum = _unpack_header(view[: HEADER.size], path)
+    payload = view[HEADER.size : HEADER.size + count * 8]
+    if len(payload) != count * 8:
+        raise ValueError(f"Truncated snapshot: {path}")
+    if verify and zlib.crc32(payload) != checksum:
+        raise ValueError(f"Checksum mismatch in snapshot: {path}")
+    if sys.byteorder == "big":
+        ids = array("Q", payload.tobytes())
+        ids.byteswap()
+        return IdSet.from_sorted(ids), synced_at
+    return IdSet.from_sorted(payload.cast("Q")), synced_at
+
+
+def import_text(text_path, path, synced_at: float = None) -> int:
+    """Converts a newline-delimited id file into a snapshot."""
+    with open(text_path) as in_file:
+        ids = IdSet(int(line) for line in map(str.strip, in_file) if line.isdigit())
+    return write_snapshot(path, ids, synced_at=synced_at)
+
+
+def export_text(path, text_path) -> int:
+    """Writes the ids of a snapshot to a newline-delimited id file."""
+    ids, _ = read_snapshot(path)
+    with open(text_path, "w") as out_file:
+        out_file.writelines(f"{i}\n" for i in ids)
+    return len(ids)
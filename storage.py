@@ -0,0 +1,354 @@
+import pathlib
+import sqlite3
+import time
+
+from array import array
+
+from loguru import logger
+
+from idset import IdSet
+
+# Every table holds a single indexed column of Twitter ids, the names of the user
+# id tables match the "<table>_file" keys of the legacy text files in
+# ConfigSettings. deleted_tweets logs the tweets removed by nuke_old_tweets.
+TABLES = (
+    "already_followed",
+    "followers",
+    "follows",
+    "non_followers",
+    "non_following",
+    "deleted_tweets",
+)
+# Profile fields of hydrated users kept in the users table, these are the fields
+# read by follow_user and unfollow_user.
+USER_FIELDS = (
+    "id",
+    "screen_name",
+    "followers_count",
+    "friends_count",
+    "statuses_count",
+    "protected",
+    "verified",
+    "following",
+    "profile_image_url",
+)
+# Tables synced page by page from the Twitter API, every page is staged in a
+# "<table>_sync" table until the whole listing has been fetched.
+SYNC_TABLES = ("followers", "follows")
+
+
+def batched(iterable, n: int):
+    """Yields lists of at most n items from iterable."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == n:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class StateStore:
+    """SQLite backed store for the follower/following state of a single handle."""
+
+    def __init__(
+        self, filename, batch_size: int = 10000, keep_changes: int = 30, _logger=logger
+    ):
+        self.filename = filename
+        self.batch_size = batch_size
+        # number of sync generations whose changes are kept in the changes table
+        self.keep_changes = keep_changes
+        self.logger = _logger
+        # the store may be created and used on different threads (one at a time)
+        self.conn = sqlite3.connect(str(filename), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.create_tables()
+
+    def create_tables(self):
+        with self.conn:
+            for table in TABLES:
+                self.conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY)"
+                )
+            for table in SYNC_TABLES:
+                self.conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table}_sync (id INTEGER PRIMARY KEY)"
+                )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS changes ("
+                "generation INTEGER, tbl TEXT, id INTEGER, added INTEGER, "
+                "PRIMARY KEY (tbl, generation, id))"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, "
+                "screen_name TEXT, followers_count INTEGER, friends_count INTEGER, "
+                "statuses_count INTEGER, protected INTEGER, verified INTEGER, "
+                "following INTEGER, profile_image_url TEXT, fetched_at REAL)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
+
+    @staticmethod
+    def _check_table(table: str) -> str:
+        if table not in TABLES:
+            raise ValueError(f"No such table: {table!r}")
+        return table
+
+    def _insert(self, table: str, ids) -> int:
+        count = 0
+        for batch in batched(ids, self.batch_size):
+            self.conn.executemany(
+                f"INSERT OR IGNORE INTO {table} (id) VALUES (?)",
+                ((int(i),) for i in batch),
+            )
+            count += len(batch)
+        return count
+
+    def add(self, table: str, ids) -> int:
+        """Inserts ids into table in batches, existing ids are ignored."""
+        table = self._check_table(table)
+        with self.conn:
+            count = self._insert(table, ids)
+            if table in SYNC_TABLES:
+                self._touch(table)
+        return count
+
+    def _touch(self, table: str) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            (f"{table}_modified", str(time.time())),
+        )
+
+    def modified(self, table: str) -> float:
+        """Returns when a synced table was last written, by a sync or otherwise."""
+        return float(self.get_meta(f"{self._check_sync_table(table)}_modified", 0))
+
+    def contains(self, table: str, user_id: int) -> bool:
+        table = self._check_table(table)
+        cursor = self.conn.execute(
+            f"SELECT 1 FROM {table} WHERE id = ?", (int(user_id),)
+        )
+        return cursor.fetchone() is not None
+
+    def missing(self, ids: list, *tables: str) -> list:
+        """Returns the ids (in order) that are in none of the tables."""
+        found = set()
+        for table in map(self._check_table, tables):
+            for batch in batched(ids, 500):
+                found.update(
+                    row[0]
+                    for row in self.conn.execute(
+                        f"SELECT id FROM {table} "
+                        f"WHERE id IN ({', '.join('?' * len(batch))})",
+                        batch,
+                    )
+                )
+        return [i for i in ids if i not in found]
+
+    def count(self, table: str) -> int:
+        table = self._check_table(table)
+        return self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def ids(self, table: str) -> IdSet:
+        """Returns all ids stored in table as a compact IdSet."""
+        table = self._check_table(table)
+        cursor = self.conn.execute(f"SELECT id FROM {table} ORDER BY id")
+        return IdSet.from_sorted(array("Q", (row[0] for row in cursor)))
+
+    def difference(self, table: str, *others: str) -> list:
+        """Returns the ids in table that are in none of the other tables."""
+        query = f"SELECT id FROM {self._check_table(table)}"
+        for other in others:
+            query += f" EXCEPT SELECT id FROM {self._check_table(other)}"
+        return [row[0] for row in self.conn.execute(query)]
+
+    def get_users(self, ids, fetched_after: float = 0) -> list:
+        """Returns the rows (USER_FIELDS, fetched_at) of ids fetched after a time."""
+        rows = []
+        for batch in batched(ids, 500):
+            rows.extend(
+                self.conn.execute(
+                    f"SELECT {', '.join(USER_FIELDS)}, fetched_at FROM users "
+                    "WHERE fetched_at > ? "
+                    f"AND id IN ({', '.join('?' * len(batch))})",
+                    [fetched_after, *batch],
+                )
+            )
+        return rows
+
+    def put_users(self, rows, fetched_at: float) -> None:
+        """Stores profile rows (USER_FIELDS) fetched at fetched_at."""
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO users ({', '.join(USER_FIELDS)}, fetched_at) "
+                f"VALUES ({', '.join('?' * (len(USER_FIELDS) + 1))})",
+                (tuple(row) + (fetched_at,) for row in rows),
+            )
+
+    def delete_users(self, ids=None, fetched_before: float = None) -> None:
+        """Deletes the profiles of ids, or those fetched before a time."""
+        with self.conn:
+            if ids is not None:
+                self.conn.executemany(
+                    "DELETE FROM users WHERE id = ?", ((int(i),) for i in ids)
+                )
+            if fetched_before is not None:
+                self.conn.execute(
+                    "DELETE FROM users WHERE fetched_at < ?", (fetched_before,)
+                )
+
+    def get_meta(self, key: str, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key: str, value) -> None:
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value))
+            )
+
+    @staticmethod
+    def _check_sync_table(table: str) -> str:
+        if table not in SYNC_TABLES:
+            raise ValueError(f"No such sync table: {table!r}")
+        return table
+
+    def sync_cursor(self, table: str) -> int:
+        """Returns the cursor to resume a sync of table from, -1 for a fresh sync."""
+        return int(self.get_meta(f"{self._check_sync_table(table)}_cursor", -1))
+
+    def reset_sync(self, table: str) -> None:
+        table = self._check_sync_table(table)
+        with self.conn:
+            self.conn.execute(f"DELETE FROM {table}_sync")
+            self.conn.execute("DELETE FROM meta WHERE key = ?", (f"{table}_cursor",))
+
+    def stage(self, table: str, ids, next_cursor: int) -> int:
+        """Stages a page of ids and checkpoints the cursor of the next page."""
+        table = self._check_sync_table(table)
+        with self.conn:
+            count = self._insert(f"{table}_sync", ids)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                (f"{table}_cursor", str(next_cursor)),
+            )
+        return count
+
+    def generation(self, table: str) -> int:
+        """Returns the number of completed syncs of table."""
+        return int(self.get_meta(f"{self._check_sync_table(table)}_generation", 0))
+
+    def commit_sync(self, table: str) -> tuple:
+        """
+        Applies the staged ids to table once every page has been fetched.
+
+        Only the ids added or removed since the previous sync are written to
+        table, and they are recorded in the changes table under a new generation.
+        Returns the number of added and removed ids.
+        """
+        table = self._check_sync_table(table)
+        generation = self.generation(table) + 1
+        key = (generation, table)
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO changes (generation, tbl, id, added) SELECT ?, ?, id, 1 "
+                f"FROM (SELECT id FROM {table}_sync EXCEPT SELECT id FROM {table})",
+                key,
+            )
+            self.conn.execute(
+                "INSERT INTO changes (generation, tbl, id, added) SELECT ?, ?, id, 0 "
+                f"FROM (SELECT id FROM {table} EXCEPT SELECT id FROM {table}_sync)",
+                key,
+            )
+            self.conn.execute(
+                f"DELETE FROM {table} WHERE id IN (SELECT id FROM changes "
+                "WHERE generation = ? AND tbl = ? AND added = 0)",
+                key,
+            )
+            self.conn.execute(
+                f"INSERT INTO {table} SELECT id FROM changes "
+                "WHERE generation = ? AND tbl = ? AND added = 1",
+                key,
+            )
+            self.conn.execute(
+                "DELETE FROM changes WHERE tbl = ? AND generation <= ?",
+                (table, generation - self.keep_changes),
+            )
+            self.conn.execute(f"DELETE FROM {table}_sync")
+            self.conn.execute("DELETE FROM meta WHERE key = ?", (f"{table}_cursor",))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                (f"{table}_generation", str(generation)),
+            )
+            self._touch(table)
+        added, removed = self.delta(table)
+        return len(added), len(removed)
+
+    def delta(self, table: str, generation: int = None) -> tuple:
+        """Returns the ids added to and removed from table by a sync (default: last)."""
+        table = self._check_sync_table(table)
+        if generation is None:
+            generation = self.generation(table)
+        added, removed = [], []
+        for user_id, was_added in self.conn.execute(
+            "SELECT id, added FROM changes WHERE generation = ? AND tbl = ?",
+            (generation, table),
+        ):
+            (added if was_added else removed).append(user_id)
+        return added, removed
+
+    def delta_difference(self, changes: tuple, *others: str, within: str = None) -> list:
+        """
+        Returns the ids of the last sync changes that are in none of the other tables.
+
+        changes: tuple
+            pairs of (sync table, added) selecting the changes to start from,
+            e.g. (("followers", True),) for the new followers.
+        within: str
+            only keep ids that are also in this table.
+        """
+        query, params = [], []
+        for table, added in changes:
+            query.append(
+                "SELECT id FROM changes WHERE generation = ? AND tbl = ? AND added = ?"
+            )
+            params.extend((self.generation(table), table, int(added)))
+        query = f"SELECT id FROM ({' UNION '.join(query)})"
+        if within:
+            query += f" INTERSECT SELECT id FROM {self._check_table(within)}"
+        for other in others:
+            query += f" EXCEPT SELECT id FROM {self._check_table(other)}"
+        return [row[0] for row in self.conn.execute(query, params)]
+
+    def vacuum(self) -> None:
+        """Rebuilds the database file, reclaiming the space of deleted rows."""
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.conn.execute("VACUUM")
+
+    def last_sync(self) -> float:
+        """Returns the timestamp of the last followers/follows sync, 0 if never synced."""
+        return float(self.get_meta("last_sync", 0))
+
+    def migrate_from_files(self, settings: dict) -> None:
+        """One-shot import of the legacy newline-delimited id files."""
+        if self.get_meta("migrated_from_files"):
+            return
+        self.logger.info(f"Migrating text files into {self.filename}.")
+        synced_at = []
+        for table in TABLES:
+            filename = settings.get(f"{table}_file")
+            if not filename or not pathlib.Path(filename).exists():
+                continue
+            with open(filename) as in_file:
+                count = self.add(
+                    table, (line for line in map(str.strip, in_file) if line.isdigit())
+                )
+            self.logger.debug(f"Imported {count} ids from {filename} into {table!r}.")
+            if table in ("followers", "follows") and count:
+                synced_at.append(pathlib.os.path.getmtime(filename))
+        if synced_at:
+            self.set_meta("last_sync", min(synced_at))
+        self.set_meta("migrated_from_files", time.time())
@@ -0,0 +1,87 @@
+import pathlib
+import sys
+
+import pytest
+import tweepy
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+import twitterBot  # noqa: E402
+
+from fakes import FakeClock, FakeEndpoints, FakeTwitter, local_transport  # noqa: E402
+from ratelimit import DEFAULT_LIMITS, RateScheduler  # noqa: E402
+
+# generous enough that no test waits on a rate limit unless it sets its own
+UNLIMITED = {endpoint: (1000000, 1) for endpoint in DEFAULT_LIMITS}
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def fake_api():
+    return FakeTwitter()
+
+
+@pytest.fixture
+def make_bot(tmp_path, monkeypatch, clock):
+    """
+    Returns a factory of TwitterBots for a handle, configured in a temporary home
+    directory, connected to the given API and rate limited on the fake clock.
+    """
+    monkeypatch.setenv("HOME", str(tmp_path))
+    for key in ("API_KEY", "API_SECRET", "ACCESS_TOKEN_KEY", "ACCESS_TOKEN_SECRET"):
+        monkeypatch.setenv(key, "fake")
+    bots = []
+    config_file = tmp_path / ".tweeterbot" / "config.ini"
+
+    def add_section(user):
+        if config_file.exists() and f"[{user}]" not in config_file.read_text():
+            with open(config_file, "a") as out_file:
+                out_file.write(f"[{user}]\n")
+
+    def make(api, user="me", limits=UNLIMITED, transport=None):
+        monkeypatch.setattr(twitterBot.TwitterBot, "connect", lambda self: api)
+        if transport is not None:
+            monkeypatch.setattr(
+                twitterBot, "shared_transport", lambda *args, **kwargs: transport
+            )
+        # the first bot writes the config, the next ones read the handle's section
+        add_section(user)
+        bot = twitterBot.TwitterBot(user=user)
+        add_section(user)
+        bot.rate_scheduler = RateScheduler(
+            limits=limits, clock=clock.time, sleep=clock.sleep, store=bot.store
+        )
+        bots.append(bot)
+        return bot
+
+    yield make
+    for bot in bots:
+        bot.sync_monitor.stop()
+        bot.save_ignored_ids()
+        bot.store.conn.close()
+
+
+@pytest.fixture
+def bot(make_bot, fake_api):
+    return make_bot(fake_api)
+
+
+@pytest.fixture
+def endpoints(fake_api):
+    """FakeEndpoints server over the state of fake_api."""
+    with FakeEndpoints(fake_api) as server:
+        yield server
+
+
+@pytest.fixture
+def http_bot(make_bot, endpoints, monkeypatch):
+    """TwitterBot whose tweepy client talks HTTP to the endpoints fixture."""
+    monkeypatch.setattr(tweepy.binder, "requests", tweepy.binder.requests)
+    transport = local_transport(endpoints)
+    auth = tweepy.OAuthHandler("fake", "fake")
+    auth.set_access_token("fake", "fake")
+    return make_bot(transport.install(tweepy.API(auth)), transport=transport)
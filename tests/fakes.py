@@ -0,0 +1,345 @@
+"""
+Fakes of the Twitter API for the tests and the benchmarks.
+
+FakeTwitter answers the tweepy API methods called by the bot in-process,
+FakeEndpoints serves the same state over HTTP to a real tweepy client, and
+FakeClock drives the rate limits in simulated time.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+from transport import TimedAdapter, Transport
+
+START = 1600000000.0
+
+
+class FakeClock:
+    """Simulated clock whose sleep() moves time() forward instead of blocking."""
+
+    def __init__(self, now: float = START):
+        self.now = now
+        self.slept = 0.0
+        self._lock = threading.Lock()
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        with self._lock:
+            self.now += seconds
+            self.slept += seconds
+
+
+def make_user(user_id: int, **fields) -> dict:
+    """Profile of a user the default candidate filter accepts."""
+    user = {
+        "id": user_id,
+        "screen_name": f"user{user_id}",
+        "followers_count": 500,
+        "friends_count": 500,
+        "statuses_count": 500,
+        "protected": False,
+        "verified": False,
+        "following": False,
+        "profile_image_url": "https://pbs.twimg.com/profile_images/1/a.png",
+    }
+    user.update(fields)
+    return user
+
+
+def user_obj(user_id: int, **fields) -> SimpleNamespace:
+    """Hydrated user, as returned by users/lookup."""
+    return SimpleNamespace(**make_user(user_id, **fields))
+
+
+def single_thread_store(bot) -> None:
+    """Reopens the store connection of bot so using it from another thread raises."""
+    bot.store.conn = sqlite3.connect(str(bot.store.filename))
+
+
+class FakeError(Exception):
+    """Failed API call, carrying its response like a TweepError."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Twitter error response: status code = {status_code}")
+        self.response = SimpleNamespace(status_code=status_code, headers={})
+
+
+class FakeTwitter:
+    """
+    In-memory Twitter account: its followers and friends ids, the profiles of
+    every user and the tweets that can be searched or deleted.
+
+    Calls are counted per endpoint in `calls`. The next calls of an endpoint
+    fail with the status codes queued in `failures[endpoint]`, and every call
+    takes `latency` seconds.
+    """
+
+    def __init__(
+        self, users=(), followers=(), friends=(), tweets=(), latency: float = 0.0
+    ):
+        self.users = {user["id"]: user for user in users}
+        self.followers = list(followers)
+        self.friends = list(friends)
+        # tweet id -> (author id, text)
+        self.tweets = {tweet_id: (user_id, text) for tweet_id, user_id, text in tweets}
+        self.latency = latency
+        self.followed = []
+        self.unfollowed = []
+        self.deleted = []
+        self.calls = Counter()
+        self.failures = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def call(self, endpoint: str) -> None:
+        with self._lock:
+            self.calls[endpoint] += 1
+            failures = self.failures[endpoint]
+            status = failures.pop(0) if failures else None
+        if self.latency:
+            time.sleep(self.latency)
+        if status:
+            raise FakeError(status)
+
+    # JSON payloads, shared by the in-process methods and the HTTP endpoints
+    def ids_page(self, endpoint: str, cursor: int, count: int) -> dict:
+        self.call(endpoint)
+        ids = self.followers if endpoint == "followers_ids" else self.friends
+        start = 0 if cursor == -1 else cursor
+        end = start + count
+        return {
+            "ids": ids[start:end],
+            "next_cursor": end if end < len(ids) else 0,
+            "previous_cursor": 0,
+        }
+
+    def lookup_payload(self, user_ids: list) -> list:
+        self.call("lookup")
+        return [self.users[i] for i in user_ids if i in self.users]
+
+    def follow_payload(self, user_id: int) -> dict:
+        self.call("follow")
+        with self._lock:
+            self.followed.append(user_id)
+            self.friends.append(user_id)
+            self.users[user_id] = {**self.users[user_id], "following": True}
+        return self.users[user_id]
+
+    def unfollow_payload(self, user_id: int) -> dict:
+        self.call("unfollow")
+        with self._lock:
+            self.unfollowed.append(user_id)
+            if user_id in self.friends:
+                self.friends.remove(user_id)
+            self.users[user_id] = {**self.users[user_id], "following": False}
+        return self.users[user_id]
+
+    def delete_payload(self, tweet_id: int) -> dict:
+        self.call("delete")
+        with self._lock:
+            if tweet_id not in self.tweets:
+                raise FakeError(404)
+            user_id, text = self.tweets.pop(tweet_id)
+            self.deleted.append(tweet_id)
+        return {"id": tweet_id, "text": text, "user": self.users[user_id]}
+
+    def search_payload(
+        self, q: str, count: int = 100, since_id: int = None, max_id: int = None, **_
+    ) -> list:
+        self.call("search")
+        with self._lock:
+            tweets = sorted(self.tweets.items(), reverse=True)
+        statuses = []
+        for tweet_id, (user_id, text) in tweets:
+            if q.lower() not in text.lower():
+                continue
+            if since_id and tweet_id <= int(since_id):
+                continue
+            if max_id and tweet_id > int(max_id):
+                continue
+            statuses.append({"id": tweet_id, "text": text, "user": self.users[user_id]})
+            if len(statuses) == int(count):
+                break
+        return statuses
+
+    # tweepy API methods
+    def followers_ids(self, cursor: int = -1, count: int = 5000, **_) -> tuple:
+        page = self.ids_page("followers_ids", cursor, count)
+        return page["ids"], (page["previous_cursor"], page["next_cursor"])
+
+    def friends_ids(self, cursor: int = -1, count: int = 5000, **_) -> tuple:
+        page = self.ids_page("friends_ids", cursor, count)
+        return page["ids"], (page["previous_cursor"], page["next_cursor"])
+
+    def lookup_users(self, user_ids: list = None, **_) -> list:
+        return [SimpleNamespace(**user) for user in self.lookup_payload(user_ids)]
+
+    def create_friendship(self, user_id: int = None, **_):
+        return SimpleNamespace(**self.follow_payload(user_id))
+
+    def destroy_friendship(self, user_id: int = None, **_):
+        return SimpleNamespace(**self.unfollow_payload(user_id))
+
+    def destroy_status(self, id: int = None, **_):
+        status = self.delete_payload(id)
+        return SimpleNamespace(**{**status, "user": SimpleNamespace(**status["user"])})
+
+    def search(self, q: str, **params) -> list:
+        return [
+            SimpleNamespace(**{**status, "user": SimpleNamespace(**status["user"])})
+            for status in self.search_payload(q, **params)
+        ]
+
+
+class FakeEndpoints(ThreadingHTTPServer):
+    """
+    Local HTTP server answering the Twitter API 1.1 endpoints the bot uses from
+    the state of a FakeTwitter.
+
+    Every response carries the x-rate-limit headers of its endpoint, from
+    `rate_limits[endpoint] = (remaining, reset)`, and the name of the endpoint in
+    an x-fake-endpoint header.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, api: FakeTwitter):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.api = api
+        self.rate_limits = {}
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def __enter__(self) -> "FakeEndpoints":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def route(self, method: str, path: str, params: dict) -> tuple:
+        """Returns the endpoint name and the JSON payload of a request."""
+        api = self.api
+        if path.startswith("/1.1/statuses/destroy/"):
+            tweet_id = int(path.rsplit("/", 1)[1].split(".")[0])
+            return "delete", lambda: api.delete_payload(tweet_id)
+        routes = {
+            ("GET", "/1.1/followers/ids.json"): (
+                "followers_ids",
+                lambda: api.ids_page(
+                    "followers_ids",
+                    int(params.get("cursor", -1)),
+                    int(params.get("count", 5000)),
+                ),
+            ),
+            ("GET", "/1.1/friends/ids.json"): (
+                "friends_ids",
+                lambda: api.ids_page(
+                    "friends_ids",
+                    int(params.get("cursor", -1)),
+                    int(params.get("count", 5000)),
+                ),
+            ),
+            ("POST", "/1.1/users/lookup.json"): (
+                "lookup",
+                lambda: api.lookup_payload(
+                    [int(i) for i in params["user_id"].split(",")]
+                ),
+            ),
+            ("POST", "/1.1/friendships/create.json"): (
+                "follow",
+                lambda: api.follow_payload(int(params["user_id"])),
+            ),
+            ("POST", "/1.1/friendships/destroy.json"): (
+                "unfollow",
+                lambda: api.unfollow_payload(int(params["user_id"])),
+            ),
+            ("GET", "/1.1/search/tweets.json"): (
+                "search",
+                lambda: {
+                    "statuses": api.search_payload(**params),
+                    "search_metadata": {"query": params["q"]},
+                },
+            ),
+        }
+        return routes[(method, path)]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately, don't wait for delayed ACKs
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def handle_request(self, method: str) -> None:
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        try:
+            endpoint, payload = self.server.route(method, url.path, params)
+        except KeyError:
+            endpoint, status, body = "unknown", 404, {"errors": [{"code": 34}]}
+        else:
+            try:
+                status, body = 200, payload()
+            except FakeError as err:
+                status = err.response.status_code
+                body = {"errors": [{"code": status, "message": str(err)}]}
+
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("x-fake-endpoint", endpoint)
+        if endpoint in self.server.rate_limits:
+            remaining, reset = self.server.rate_limits[endpoint]
+            self.send_header("x-rate-limit-remaining", str(remaining))
+            self.send_header("x-rate-limit-reset", str(reset))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        self.handle_request("GET")
+
+    def do_POST(self) -> None:
+        self.handle_request("POST")
+
+
+class LocalAdapter(TimedAdapter):
+    """Sends the requests meant for api.twitter.com to a FakeEndpoints server."""
+
+    def __init__(self, base_url: str, *args, **kwargs):
+        self.base_url = base_url
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        request.url = request.url.replace("https://api.twitter.com", self.base_url)
+        return super().send(request, **kwargs)
+
+
+def local_transport(endpoints: FakeEndpoints, pool_size: int = 32) -> Transport:
+    """Transport whose connection pool is connected to a FakeEndpoints server."""
+    transport = Transport(pool_size=pool_size, retries=0)
+    transport.adapter = LocalAdapter(
+        endpoints.url,
+        transport.stats,
+        _logger=transport.logger,
+        pool_maxsize=pool_size,
+        max_retries=0,
+    )
+    return transport
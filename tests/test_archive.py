@@ -0,0 +1,71 @@
+import json
+import zipfile
+
+import pytest
+
+from archive import iter_old_tweet_ids, iter_tweets_js
+
+
+def tweets_js(part: int, tweets: list) -> str:
+    """Contents of an archive tweet file, a JS-wrapped JSON array."""
+    items = [
+        {"tweet": {"id_str": str(tweet_id), "created_at": created_at}}
+        for tweet_id, created_at in tweets
+    ]
+    return f"window.YTD.tweet.part{part} = {json.dumps(items, indent=2)}"
+
+
+@pytest.fixture
+def archive_zip(tmp_path):
+    path = tmp_path / "twitter-archive.zip"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr(
+            "data/tweet.js",
+            tweets_js(0, [(1, "Wed Oct 10 20:19:24 +0000 2018")]),
+        )
+        archive.writestr(
+            "data/tweet-part1.js",
+            tweets_js(1, [(2, "Mon Jan 01 00:00:00 +0000 2018")]),
+        )
+        archive.writestr(
+            "data/tweet-part2.js",
+            tweets_js(2, [(3, "Sun Jan 01 00:00:00 +0000 2023")]),
+        )
+        archive.writestr("data/tweet-headers.js", tweets_js(0, [(4, "")]))
+        archive.writestr("data/tweetdeck.js", "window.YTD.tweetdeck.part0 = []")
+    return path
+
+
+def test_reads_every_part_of_a_zip(archive_zip):
+    assert sorted(i for i, _ in iter_tweets_js(archive_zip)) == [1, 2, 3]
+
+
+def test_old_tweets_of_every_part(archive_zip):
+    assert sorted(iter_old_tweet_ids(archive_zip, "2020-01-01")) == [1, 2]
+
+
+def test_reads_tweets_js_parts_of_older_archives(tmp_path):
+    path = tmp_path / "archive.zip"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("data/tweets.js", tweets_js(0, [(1, "2016-05-01")]))
+        archive.writestr("data/tweets-part1.js", tweets_js(1, [(2, "2016-05-02")]))
+    assert sorted(iter_old_tweet_ids(path, "2020-01-01")) == [1, 2]
+
+
+def test_reads_a_memory_mapped_tweets_js(tmp_path):
+    path = tmp_path / "tweets.js"
+    tweets = [(i, "Wed Oct 10 20:19:24 +0000 2018") for i in range(1, 5001)]
+    path.write_text(tweets_js(0, tweets))
+    assert list(iter_old_tweet_ids(path, "2019-01-01")) == list(range(1, 5001))
+    assert list(iter_old_tweet_ids(path, "2018-10-10")) == []
+
+
+def test_reads_a_tweets_csv(tmp_path):
+    path = tmp_path / "tweets.csv"
+    path.write_text(
+        "tweet_id,timestamp,text\n"
+        "1,2016-05-01 12:34:56 +0000,old\n"
+        "2,2021-05-01 12:34:56 +0000,new\n"
+        "3,,no timestamp\n"
+    )
+    assert list(iter_old_tweet_ids(path, "2020-01-01")) == [1, 3]
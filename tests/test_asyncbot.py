@@ -0,0 +1,116 @@
+"""AsyncTwitterBot workflows against the local fake endpoints, over HTTP."""
+import asyncio
+
+import pytest
+
+from asyncbot import AsyncTwitterBot
+from fakes import make_user, single_thread_store
+
+
+@pytest.fixture
+def async_bot(http_bot):
+    # the store must only be used from the event loop thread
+    single_thread_store(http_bot)
+    return AsyncTwitterBot(http_bot)
+
+
+@pytest.fixture
+def followers(fake_api):
+    """250 followers, none of them followed back."""
+    fake_api.users = {i: make_user(i) for i in range(1, 251)}
+    fake_api.followers = list(fake_api.users)
+    return fake_api.followers
+
+
+def test_sync_follows(async_bot, fake_api, followers):
+    fake_api.friends = [1, 2, 3]
+    asyncio.run(async_bot.sync_follows())
+
+    assert async_bot.store.count("followers") == 250
+    assert async_bot.store.count("follows") == 3
+
+
+def test_auto_follow_followers(async_bot, fake_api, followers):
+    asyncio.run(async_bot.auto_follow_followers(auto_sync=True))
+
+    assert sorted(fake_api.followed) == followers
+    assert fake_api.calls["lookup"] == 3
+    assert async_bot.bot.follow_stats["auto_follow_followers"]["followed"] == 250
+
+    # the follows are known before the next sync
+    asyncio.run(async_bot.auto_follow_followers())
+    assert len(fake_api.followed) == 250
+    assert async_bot.store.count("non_following") == 0
+
+
+def test_auto_follow_followers_of_user(async_bot, fake_api, followers):
+    fake_api.users[7]["protected"] = True
+    asyncio.run(async_bot.auto_follow_followers_of_user("other"))
+
+    assert len(fake_api.followed) == 249
+    assert 7 not in fake_api.followed
+    assert 7 in async_bot.bot.ignored_ids
+
+
+def test_auto_follow_by_hashtag(async_bot, fake_api):
+    fake_api.users = {i: make_user(i) for i in range(1, 76)}
+    fake_api.tweets = {1000 + i: (i, f"tweet {i} #python") for i in fake_api.users}
+    stats = asyncio.run(async_bot.auto_follow_by_hashtag("#python"))
+
+    assert sorted(fake_api.followed) == list(fake_api.users)
+    assert stats["#python"]["followed"] == 75
+
+    # only the tweets newer than the last search are fetched
+    asyncio.run(async_bot.auto_follow_by_hashtag("#python"))
+    assert len(fake_api.followed) == 75
+
+
+def test_auto_unfollow_nonfollowers(async_bot, fake_api):
+    fake_api.users = {i: make_user(i, following=True) for i in range(1, 11)}
+    fake_api.friends = list(fake_api.users)
+    fake_api.followers = [1, 2, 3, 4, 5]
+    asyncio.run(async_bot.auto_unfollow_nonfollowers(auto_sync=True))
+
+    assert sorted(fake_api.unfollowed) == [6, 7, 8, 9, 10]
+
+
+def test_nuke_old_tweets(async_bot, fake_api, tmp_path):
+    fake_api.users = {1: make_user(1)}
+    fake_api.tweets = {i: (1, f"tweet {i}") for i in range(1, 6)}
+    path = tmp_path / "tweets.csv"
+    rows = [f"{i},2016-05-0{i} 12:00:00 +0000,tweet {i}" for i in range(1, 5)]
+    rows.append("5,2022-01-01 12:00:00 +0000,tweet 5")
+    path.write_text("tweet_id,timestamp,text\n" + "\n".join(rows) + "\n")
+    asyncio.run(async_bot.nuke_old_tweets(to_date="2020-01-01", tweets_csv_file=path))
+
+    assert sorted(fake_api.deleted) == [1, 2, 3, 4]
+    assert async_bot.store.count("deleted_tweets") == 4
+
+
+def test_interrupted_sync_resumes(async_bot, fake_api):
+    fake_api.followers = list(range(1, 12001))
+    fake_api.failures["followers_ids"] = [None, 429]
+    with pytest.raises(Exception):
+        asyncio.run(async_bot.sync_follows())
+    assert async_bot.store.sync_cursor("followers") == 5000
+
+    asyncio.run(async_bot.sync_follows())
+    assert fake_api.calls["followers_ids"] == 4
+    assert async_bot.store.count("followers") == 12000
+
+
+def test_transient_delete_errors_are_retried(async_bot, fake_api):
+    fake_api.users = {1: make_user(1)}
+    fake_api.tweets = {1: (1, "tweet 1")}
+    fake_api.failures["delete"] = [503]
+    assert asyncio.run(async_bot.destroy_status(1, backoff=0))
+    assert asyncio.run(async_bot.destroy_status(1, backoff=0))
+    assert fake_api.calls["delete"] == 3
+
+
+def test_nuke_old_tweets_checks_the_date(async_bot, fake_api, tmp_path):
+    path = tmp_path / "tweets.csv"
+    path.write_text("tweet_id,timestamp,text\n1,2016-05-01 12:00:00 +0000,old\n")
+    asyncio.run(async_bot.nuke_old_tweets(to_date="01/01/2020", tweets_csv_file=path))
+    asyncio.run(async_bot.nuke_old_tweets(to_date="2020-01-01"))
+    assert fake_api.calls["delete"] == 0
@@ -0,0 +1,104 @@
+import gc
+import random
+import weakref
+
+import pytest
+
+import bloom
+import twitterBot
+
+from bloom import BloomFilter
+
+
+def test_save_and_load(tmp_path):
+    path = tmp_path / "ids.bloom"
+    ids = random.sample(range(1, 10**12), 1000)
+    saved = BloomFilter(2000)
+    saved.update(ids)
+    saved.save(path, count=1000)
+
+    loaded, count = BloomFilter.load(path)
+    assert count == 1000
+    assert (loaded.capacity, loaded.bits, loaded.hashes) == (
+        saved.capacity,
+        saved.bits,
+        saved.hashes,
+    )
+    assert loaded.array == saved.array
+    assert all(i in loaded for i in ids)
+
+
+def test_load_rejects_damaged_files(tmp_path):
+    path = tmp_path / "ids.bloom"
+    BloomFilter(100).save(path, count=0)
+    path.write_bytes(path.read_bytes()[:-1])
+    with pytest.raises(ValueError, match="Truncated"):
+        BloomFilter.load(path)
+    path.write_bytes(b"not a bloom filter" * 4)
+    with pytest.raises(ValueError, match="Not a version"):
+        BloomFilter.load(path)
+
+
+@pytest.mark.skipif(bloom.np is None, reason="numpy is not installed")
+def test_numpy_and_python_updates_set_the_same_bits(monkeypatch):
+    ids = random.sample(range(1, 2**63), 5000)
+    vectorized = BloomFilter(10000)
+    vectorized.update(ids)
+    monkeypatch.setattr(bloom, "np", None)
+    looped = BloomFilter(10000)
+    looped.update(ids)
+    assert vectorized.array == looped.array
+
+
+def test_stale_filter_is_rebuilt(make_bot, fake_api):
+    bot = make_bot(fake_api)
+    bot.ignore_user(user_id=[1, 2])
+    bot.save_ignored_ids()
+    # written by another process, the saved filter does not have it
+    bot.store.add("non_following", [3])
+
+    assert 3 in make_bot(fake_api).ignored_ids
+
+
+def test_filter_over_capacity_is_rebuilt(make_bot, fake_api):
+    bot = make_bot(fake_api)
+    path = bot.default_settings["ignored_bloom_file"]
+    bot.store.add("non_following", range(1, 21))
+    BloomFilter(10).save(path, count=20)
+
+    assert bot.load_ignored_bloom().capacity >= 40
+    assert BloomFilter.load(path)[0].capacity >= 40
+
+
+def test_compact_deduplicates_non_following(tmp_path, make_bot, fake_api):
+    config_dir = tmp_path / ".tweeterbot"
+    config_dir.mkdir()
+    (config_dir / "non-following.txt").write_text("3\n1\n3\n2\n1\n")
+    bot = make_bot(fake_api)
+    bot.compact()
+
+    assert (config_dir / "non-following.txt").read_text() == "1\n2\n3\n"
+    assert all(i in bot.ignored_ids for i in (1, 2, 3))
+
+
+def test_dirty_filter_of_a_closed_store_is_not_saved(bot):
+    bot.ignore_user(user_id=5)
+    bot.store.conn.close()
+    bot.save_ignored_ids()
+    assert bot.ignored_ids.dirty == 1
+
+
+def test_bots_are_saved_at_exit_without_being_kept_alive(make_bot, fake_api):
+    bot = make_bot(fake_api)
+    bot.ignore_user(user_id=5)
+    twitterBot._save_ignored_ids()
+    assert bot.ignored_ids.dirty == 0
+
+    # a bot built outside of make_bot, which keeps its bots
+    other = twitterBot.TwitterBot(user="me")
+    other.sync_monitor.stop()
+    other.store.conn.close()
+    ref = weakref.ref(other)
+    del other
+    gc.collect()
+    assert ref() is None
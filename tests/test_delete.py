@@ -0,0 +1,60 @@
+import sqlite3
+
+import pytest
+
+from fakes import make_user, single_thread_store
+
+
+@pytest.fixture
+def old_tweets(fake_api, tmp_path):
+    """tweets.csv archive of 4 old tweets and 1 recent tweet."""
+    fake_api.users = {1: make_user(1)}
+    fake_api.tweets = {i: (1, f"tweet {i}") for i in range(1, 6)}
+    path = tmp_path / "tweets.csv"
+    rows = [f"{i},2016-05-0{i} 12:00:00 +0000,tweet {i}" for i in range(1, 5)]
+    rows.append("5,2022-01-01 12:00:00 +0000,tweet 5")
+    path.write_text("tweet_id,timestamp,text\n" + "\n".join(rows) + "\n")
+    return path
+
+
+def test_nuke_old_tweets_keeps_the_workers_off_the_store(bot, fake_api, old_tweets):
+    single_thread_store(bot)
+    bot.nuke_old_tweets(to_date="2020-01-01", tweets_csv_file=old_tweets)
+
+    assert sorted(fake_api.deleted) == [1, 2, 3, 4]
+    assert fake_api.calls["delete"] == 4
+    assert bot.store.count("deleted_tweets") == 4
+
+
+def test_deleted_tweets_are_skipped_on_the_next_run(bot, fake_api, old_tweets):
+    bot.nuke_old_tweets(to_date="2020-01-01", tweets_csv_file=old_tweets)
+    bot.nuke_old_tweets(to_date="2020-01-01", tweets_csv_file=old_tweets)
+    assert fake_api.calls["delete"] == 4
+
+
+def test_transient_errors_are_retried(bot, fake_api, old_tweets):
+    fake_api.failures["delete"] = [503, 429]
+    assert bot.destroy_status(1, backoff=0)
+    assert fake_api.deleted == [1]
+    assert fake_api.calls["delete"] == 3
+
+
+def test_already_deleted_tweets_are_gone(bot, fake_api):
+    assert bot.destroy_status(42, backoff=0)
+
+
+def test_other_errors_are_not_retried(bot, fake_api, monkeypatch):
+    def destroy_status(id=None):
+        fake_api.call("delete")
+        raise sqlite3.ProgrammingError("used from another thread")
+
+    monkeypatch.setattr(fake_api, "destroy_status", destroy_status)
+    with pytest.raises(sqlite3.ProgrammingError):
+        bot.destroy_status(1, backoff=0)
+    assert fake_api.calls["delete"] == 1
+
+
+def test_client_errors_are_not_retried(bot, fake_api):
+    fake_api.failures["delete"] = [403]
+    assert bot.delete_tweets([1], retries=3) == 0
+    assert fake_api.calls["delete"] == 1
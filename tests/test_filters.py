@@ -0,0 +1,127 @@
+import pytest
+
+from fakes import make_user, user_obj
+from filters import CandidateFilter, UnfollowFilter
+
+
+@pytest.fixture
+def hashtag_tweets(fake_api):
+    """75 tweets about #python by 75 authors."""
+    fake_api.users = {i: make_user(i) for i in range(1, 76)}
+    fake_api.tweets = {1000 + i: (i, f"tweet {i} #python") for i in fake_api.users}
+
+
+def test_rules_are_reordered_by_rejection_rate():
+    candidate_filter = CandidateFilter(reorder_every=10)
+    assert candidate_filter.pipeline[0][0] == "self"
+    for i in range(20):
+        assert candidate_filter.check(user_obj(i, protected=True)) == "protected"
+    assert candidate_filter.pipeline[0][0] == "protected"
+    assert candidate_filter.stats()["protected"]["rejected"] == 20
+
+
+def test_screen_matches_check():
+    users = [
+        user_obj(1),
+        user_obj(2, protected=True),
+        user_obj(3, followers_count=10, friends_count=10),
+        user_obj(4, friends_count=0),
+        user_obj(5, following=True),
+        user_obj(6, screen_name="me"),
+    ]
+    accepted, reasons = CandidateFilter(twitter_handle="me").screen(users)
+    checked = [CandidateFilter(twitter_handle="me").check(u) for u in users]
+    assert reasons == checked
+    assert accepted == [reason is None for reason in checked]
+
+
+def test_unfollow_filter_keeps_verified_users():
+    assert UnfollowFilter().check(user_obj(1, following=True, verified=True))
+    assert not UnfollowFilter(unfollow_verified=True).check(
+        user_obj(1, following=True, verified=True)
+    )
+
+
+def test_hashtag_filter_is_compiled_once_and_counted(bot, fake_api, hashtag_tweets):
+    hashtag_filter = bot.hashtag_filter()
+    bot.auto_follow_by_hashtag("#python")
+
+    assert bot.hashtag_filter() is hashtag_filter
+    assert len(fake_api.followed) == 75
+    evaluated = [rule["evaluated"] for rule in bot.rule_stats()["hashtag"].values()]
+    assert evaluated == [75] * len(evaluated)
+
+
+def test_hashtag_authors_need_more_tweets_than_searched(bot, fake_api, hashtag_tweets):
+    fake_api.users[1]["statuses_count"] = 200
+    fake_api.users[2]["statuses_count"] = 201
+    bot.auto_follow_by_hashtag("#python", count=200)
+
+    assert 1 not in fake_api.followed
+    assert 2 in fake_api.followed
+    assert bot.rule_stats()["hashtag"]["tweets"]["rejected"] == 1
+
+
+def test_overridden_thresholds_are_compiled_once(bot, fake_api):
+    profile = {"followers_count": 60, "friends_count": 60}
+    fake_api.users = {i: make_user(i, **profile) for i in range(1, 3)}
+    for i in fake_api.users:
+        bot.follow_user(user_obj(i, **profile), n_followers=50)
+
+    assert len(fake_api.followed) == 2
+    override_stats = bot.rule_stats()["follow_override"]
+    assert override_stats["followers"]["evaluated"] == 2
+    assert len(bot.filter_variants) == 1
+
+    # other thresholds replace the variant
+    bot.follow_user(user_obj(3, **profile), n_followers=80)
+    assert bot.rule_stats()["follow_override"]["followers"]["rejected"] == 1
+
+
+def test_screen_reorders_rules_by_rejection_rate():
+    candidate_filter = CandidateFilter(reorder_every=10)
+    candidate_filter.screen([user_obj(i, protected=True) for i in range(20)])
+    assert candidate_filter.pipeline[0][0] == "protected"
+    assert candidate_filter.checked == 20
+
+
+def test_each_hydrated_batch_is_screened_at_once(bot, fake_api, monkeypatch):
+    fake_api.users = {i: make_user(i) for i in range(1, 251)}
+    fake_api.followers = list(fake_api.users)
+    bot.sync_follows()
+    screened = []
+    screen = bot.candidate_filter.screen
+
+    def spy(users):
+        screened.append(users)
+        return screen(users)
+
+    monkeypatch.setattr(bot.candidate_filter, "screen", spy)
+    bot.auto_follow_followers()
+
+    assert sorted(len(users) for users in screened) == [50, 100, 100]
+    assert len(fake_api.followed) == 250
+
+
+def test_hashtag_search_resumes_from_the_newest_tweet(bot, fake_api, hashtag_tweets):
+    bot.auto_follow_by_hashtag("#python")
+    # 75 tweets: one short page, no empty page after it
+    assert fake_api.calls["search"] == 1
+    assert bot.store.get_meta("since_id:#python") == "1075"
+
+    fake_api.users[76] = make_user(76)
+    fake_api.tweets[2000] = (76, "newer #python tweet")
+    stats = bot.auto_follow_by_hashtag("#python")
+
+    assert fake_api.calls["search"] == 2
+    assert stats["#python"]["tweets"] == 1
+    assert fake_api.followed[-1] == 76
+    assert bot.store.get_meta("since_id:#python") == "2000"
+
+
+def test_search_pages_stop_at_count_or_a_short_page(bot, fake_api):
+    fake_api.users = {1: make_user(1)}
+    fake_api.tweets = {i: (1, "#python") for i in range(1, 251)}
+    assert [len(page) for page in bot.search_pages("#python", 200)] == [100, 100]
+    assert [len(page) for page in bot.search_pages("#python", 300)] == [100, 100, 50]
+    assert fake_api.calls["search"] == 5
@@ -0,0 +1,91 @@
+import pytest
+
+from fakes import make_user, single_thread_store
+
+
+@pytest.fixture
+def followers(fake_api):
+    """250 followers, none of them followed back."""
+    fake_api.users = {i: make_user(i) for i in range(1, 251)}
+    fake_api.followers = list(fake_api.users)
+    return fake_api.followers
+
+
+def test_hydrates_every_batch(bot, fake_api, followers):
+    bot.sync_follows()
+    users = list(bot.hydrate_users(followers))
+    assert sorted(user.id for user in users) == followers
+    assert fake_api.calls["lookup"] == 3
+
+
+def test_follow_back_keeps_lookups_off_the_store(bot, fake_api, followers):
+    bot.sync_follows()
+    single_thread_store(bot)
+    bot.auto_follow_followers()
+
+    assert sorted(fake_api.followed) == followers
+    assert bot.store.count("non_following") == 0
+    assert bot.follow_stats["auto_follow_followers"]["followed"] == 250
+
+
+def test_failed_batch_is_skipped_not_ignored(bot, fake_api, followers):
+    bot.sync_follows()
+    fake_api.failures["lookup"] = [429]
+    bot.auto_follow_followers()
+
+    assert len(fake_api.followed) == 150
+    assert bot.store.count("non_following") == 0
+
+    # the users of the failed batch are followed on the next run
+    bot.sync_follows()
+    bot.auto_follow_followers()
+    assert sorted(fake_api.followed) == followers
+
+
+def test_cached_users_are_not_looked_up_again(bot, fake_api, followers):
+    list(bot.hydrate_users(followers[:150]))
+    list(bot.hydrate_users(followers))
+    assert fake_api.calls["lookup"] == 3
+
+
+def test_follows_are_recorded_before_the_next_sync(bot, fake_api, followers):
+    bot.sync_follows()
+    bot.auto_follow_followers()
+    bot.auto_follow_followers()
+
+    assert sorted(fake_api.followed) == followers
+    assert bot.store.count("non_following") == 0
+    assert bot.store.count("follows") == 250
+
+
+def test_followed_ids_are_dropped_before_lookup(bot, fake_api, followers):
+    bot.auto_follow_followers_of_user("other")
+    bot.auto_follow_followers_of_user("other")
+
+    assert fake_api.calls["lookup"] == 3
+    assert bot.follow_stats["auto_follow_followers_of_user"]["unknown"] == 0
+    assert bot.store.count("non_following") == 0
+
+
+def test_follows_are_known_to_the_next_process(make_bot, fake_api, followers):
+    make_bot(fake_api).auto_follow_followers_of_user("other")
+    bot = make_bot(fake_api)
+    bot.auto_follow_followers_of_user("other")
+
+    assert fake_api.calls["lookup"] == 3
+    assert bot.store.count("non_following") == 0
+
+    # the users followed are not ignored, so they can be unfollowed later
+    fake_api.followers = []
+    bot.sync_follows()
+    assert len(bot.unfollow_candidates()) == 250
+
+
+def test_users_already_followed_are_not_ignored(bot, fake_api):
+    fake_api.users = {1: make_user(1, following=True)}
+    fake_api.followers = [1]
+    bot.sync_follows()
+    bot.auto_follow_followers()
+
+    assert fake_api.followed == []
+    assert bot.store.count("non_following") == 0
@@ -0,0 +1,45 @@
+import random
+
+import pytest
+
+import idset
+
+from idset import IdSet
+
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(idset, "np", None)
+    elif idset.np is None:
+        pytest.skip("numpy is not installed")
+    return request.param
+
+
+def test_set_operations_match_builtin_sets(backend):
+    a = random.sample(range(1, 10000), 3000)
+    b = random.sample(range(1, 10000), 3000)
+    assert list(IdSet(a) | IdSet(b)) == sorted(set(a) | set(b))
+    assert list(IdSet(a) - IdSet(b)) == sorted(set(a) - set(b))
+    assert list(IdSet(a) & IdSet(b)) == sorted(set(a) & set(b))
+    assert list(IdSet(a) | b) == sorted(set(a) | set(b))
+
+
+def test_empty_sets(backend):
+    assert list(IdSet() | IdSet([2, 1])) == [1, 2]
+    assert list(IdSet([1]) - IdSet()) == [1]
+    assert list(IdSet() & IdSet([1])) == []
+
+
+def test_add_and_membership(backend):
+    ids = IdSet([5, 1], merge_every=2)
+    for user_id in (3, 1, 7):
+        ids.add(user_id)
+    assert all(i in ids for i in (1, 3, 5, 7))
+    assert 2 not in ids
+    assert list(ids) == [1, 3, 5, 7]
+
+
+def test_large_ids(backend):
+    big = 2 ** 63 + 5
+    assert list(IdSet([big, 1]) | IdSet([big, 2])) == [1, 2, big]
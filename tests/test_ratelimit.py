@@ -0,0 +1,135 @@
+import sys
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from fakes import START, make_user, user_obj
+from ratelimit import DEFAULT_LIMITS, RateScheduler, TokenBucket
+
+
+def max_overdraft(times: list, capacity: int, rate: float) -> float:
+    """
+    Largest excess of requests sent in any interval over what a token bucket of
+    that capacity and rate allows: capacity + rate * length of the interval.
+    """
+    worst, best_start = -float("inf"), -float("inf")
+    for j, sent_at in enumerate(times):
+        # requests in [times[i], times[j]] = j - i + 1
+        best_start = max(best_start, rate * sent_at - j)
+        worst = max(worst, j + 1 - rate * sent_at + best_start - capacity)
+    return worst
+
+
+@pytest.mark.parametrize("endpoint", sorted(DEFAULT_LIMITS))
+def test_throughput_reaches_the_allowed_rate(clock, endpoint):
+    capacity, period = DEFAULT_LIMITS[endpoint]
+    scheduler = RateScheduler(clock=clock.time, sleep=clock.sleep)
+    sent = []
+    for _ in range(3 * capacity):
+        scheduler.acquire(endpoint)
+        sent.append(clock.time())
+
+    # the first window is spent at once, then one request per 1 / rate seconds
+    rate = capacity / period
+    assert sent[capacity - 1] == START
+    assert (len(sent) - capacity) / (sent[-1] - START) == pytest.approx(rate)
+    assert max_overdraft(sent, capacity, rate) <= 1e-6
+
+
+def test_exhausted_window_waits_for_the_reset(clock):
+    scheduler = RateScheduler(clock=clock.time, sleep=clock.sleep)
+    scheduler.update_from_headers(
+        "search",
+        {"x-rate-limit-remaining": "0", "x-rate-limit-reset": str(START + 600)},
+    )
+    assert scheduler.acquire("search") == pytest.approx(600)
+    assert scheduler.acquire("search") == 0
+
+
+def test_remaining_header_caps_the_bucket(clock):
+    bucket = TokenBucket(100, 100, clock=clock.time)
+    bucket.update(remaining=2, reset=START + 100)
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, pytest.approx(1)]
+
+
+def test_bot_follows_at_the_daily_limit(make_bot, fake_api, clock):
+    fake_api.users = {i: make_user(i) for i in range(1, 801)}
+    bot = make_bot(fake_api, limits={"follow": (400, 86400)})
+    for user_id in fake_api.users:
+        bot.create_friendship(user_obj(user_id))
+
+    assert len(fake_api.followed) == 800
+    # 400 follows at once, the next 400 over the following day
+    assert clock.slept == pytest.approx(86400, abs=1)
+
+
+def test_daily_budget_carries_over_to_the_next_run(make_bot, fake_api, clock):
+    fake_api.users = {i: make_user(i) for i in range(1, 402)}
+    limits = {"follow": (400, 86400)}
+    bot = make_bot(fake_api, limits=limits)
+    for user_id in range(1, 401):
+        bot.create_friendship(user_obj(user_id))
+    assert clock.slept == 0
+
+    # an hour later, a new run has refilled 400 / 24 follows, not 400
+    clock.now += 3600
+    bot = make_bot(fake_api, limits=limits)
+    bucket = bot.rate_scheduler.bucket("follow")
+    assert bucket.tokens == pytest.approx(400 / 24)
+
+    for user_id in range(401, 418):
+        bot.create_friendship(user_obj(user_id))
+    assert clock.slept == pytest.approx(86400 / 400 * (17 - 400 / 24))
+
+
+def test_short_windows_are_not_saved(make_bot, fake_api):
+    bot = make_bot(fake_api, limits={})
+    bot.rate_scheduler.acquire("lookup")
+    bot.rate_scheduler.acquire("follow")
+    assert bot.store.get_meta("rate_limit:lookup") is None
+    tokens, updated, _ = bot.store.get_meta("rate_limit:follow").split(",")
+    assert (float(tokens), float(updated)) == (399, START)
+
+
+@pytest.fixture
+def fast_switching():
+    """Switches threads as often as possible, to interleave concurrent calls."""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_rate_limit_headers_stay_with_their_call(
+    http_bot, endpoints, fake_api, fast_switching
+):
+    # lookups parse 100 users after tweepy stored their response in last_response
+    fake_api.users = {i: make_user(i) for i in range(1, 101)}
+    endpoints.rate_limits = {
+        "lookup": (899, int(START) + 900),
+        "follow": (0, int(START) + 86400),
+    }
+    updates = []
+    update_from_headers = http_bot.rate_scheduler.update_from_headers
+
+    def record(endpoint, headers):
+        updates.append((endpoint, headers and headers.get("x-fake-endpoint")))
+        update_from_headers(endpoint, headers)
+
+    http_bot.rate_scheduler.update_from_headers = record
+
+    def call(i):
+        if i % 2:
+            http_bot.call_api(
+                "lookup", http_bot.twitter.lookup_users, user_ids=list(fake_api.users)
+            )
+        else:
+            http_bot.call_api("follow", http_bot.twitter.create_friendship, user_id=1)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(call, range(200)))
+
+    assert len(updates) == 200
+    assert all(endpoint == served_by for endpoint, served_by in updates)
+    assert http_bot.rate_scheduler.bucket("lookup").blocked_until == 0
@@ -0,0 +1,45 @@
+import configparser
+
+import pytest
+
+from settings import HANDLE_FILES, ConfigSettings
+
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    for key in ("API_KEY", "API_SECRET", "ACCESS_TOKEN_KEY", "ACCESS_TOKEN_SECRET"):
+        monkeypatch.setenv(key, "fake")
+    return tmp_path / "config.ini"
+
+
+def test_handle_files_are_not_written_to_default(config_file):
+    ConfigSettings(filename=config_file, user="alice")
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    assert not set(HANDLE_FILES) & set(config.defaults())
+
+
+def test_every_handle_gets_its_own_files(config_file):
+    alice = ConfigSettings(filename=config_file, user="alice").default_settings
+    with open(config_file, "a") as out_file:
+        out_file.write("[alice]\n[bob]\ntwitter_handle = bob\n")
+    bob = ConfigSettings(filename=config_file, user="bob").default_settings
+
+    assert alice["database_file"] == config_file.parent / "alice.db"
+    assert bob["database_file"] == config_file.parent / "bob.db"
+    for key in HANDLE_FILES:
+        assert alice[key] != bob[key]
+
+
+def test_files_inherited_from_an_old_default_section_are_ignored(config_file):
+    config_file.write_text(
+        "[DEFAULT]\n"
+        "api_key = fake\n"
+        f"database_file = {config_file.parent / 'alice.db'}\n"
+        "[alice]\n"
+        "[bob]\n"
+        f"ignored_bloom_file = {config_file.parent / 'b.bloom'}\n"
+    )
+    bob = ConfigSettings(filename=config_file, user="bob").default_settings
+    assert bob["database_file"] == config_file.parent / "bob.db"
+    assert str(bob["ignored_bloom_file"]) == str(config_file.parent / "b.bloom")
@@ -0,0 +1,67 @@
+import pytest
+
+from fakes import make_user
+from snapshot import HEADER, export_text, import_text, read_header, read_snapshot
+from snapshot import write_snapshot
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "ids.bin"
+    assert write_snapshot(path, [5, 3, 2**63, 3], synced_at=1234.5) == 3
+    ids, synced_at = read_snapshot(path)
+    assert list(ids) == [3, 5, 2**63]
+    assert synced_at == 1234.5
+    assert read_header(path)[:2] == (3, 1234.5)
+
+
+def test_empty_snapshot(tmp_path):
+    path = tmp_path / "ids.bin"
+    write_snapshot(path, [], synced_at=1.0)
+    assert path.stat().st_size == HEADER.size
+    ids, synced_at = read_snapshot(path)
+    assert list(ids) == [] and synced_at == 1.0
+
+
+def test_checksum_mismatch(tmp_path):
+    path = tmp_path / "ids.bin"
+    write_snapshot(path, range(1, 100))
+    data = bytearray(path.read_bytes())
+    data[HEADER.size] ^= 0xFF
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="Checksum"):
+        read_snapshot(path)
+    assert len(read_snapshot(path, verify=False)[0]) == 99
+
+
+def test_truncated_payload(tmp_path):
+    path = tmp_path / "ids.bin"
+    write_snapshot(path, range(1, 100))
+    path.write_bytes(path.read_bytes()[:-8])
+    with pytest.raises(ValueError, match="Truncated"):
+        read_snapshot(path)
+
+
+def test_not_a_snapshot(tmp_path):
+    path = tmp_path / "ids.bin"
+    path.write_bytes(b"\n".join(b"12345" for _ in range(10)))
+    with pytest.raises(ValueError, match="Not a version"):
+        read_snapshot(path)
+
+
+def test_import_and_export_text(tmp_path):
+    text_path = tmp_path / "following.txt"
+    text_path.write_text("3\n1\n\nnot an id\n2\n3\n")
+    assert import_text(text_path, tmp_path / "ids.bin", synced_at=7.0) == 3
+    assert export_text(tmp_path / "ids.bin", tmp_path / "out.txt") == 3
+    assert (tmp_path / "out.txt").read_text() == "1\n2\n3\n"
+
+
+def test_snapshot_is_not_used_once_the_table_changed(make_bot, fake_api):
+    fake_api.users = {i: make_user(i) for i in range(1, 4)}
+    fake_api.friends = [1, 2]
+    bot = make_bot(fake_api)
+    bot.sync_follows()
+    assert list(make_bot(fake_api).load_synced_ids("follows")) == [1, 2]
+
+    bot.record_follow(3)
+    assert list(make_bot(fake_api).load_synced_ids("follows")) == [1, 2, 3]
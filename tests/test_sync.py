@@ -0,0 +1,91 @@
+import pytest
+
+from fakes import FakeError, make_user
+
+
+def staged(bot, table: str) -> int:
+    return bot.store.conn.execute(f"SELECT COUNT(*) FROM {table}_sync").fetchone()[0]
+
+
+@pytest.fixture
+def many_followers(fake_api):
+    """12000 followers, listed in 3 pages of 5000 ids."""
+    fake_api.followers = list(range(1, 12001))
+    return fake_api.followers
+
+
+def test_sync_pages_through_every_follower(bot, fake_api, many_followers):
+    bot.sync_follows()
+    assert fake_api.calls["followers_ids"] == 3
+    assert bot.store.count("followers") == 12000
+    assert staged(bot, "followers") == 0
+
+
+def test_interrupted_sync_resumes_from_the_checkpoint(bot, fake_api, many_followers):
+    fake_api.failures["followers_ids"] = [None, 429]
+    with pytest.raises(FakeError):
+        bot.sync_follows()
+
+    # page 1 is staged, the table is untouched until every page was fetched
+    assert bot.store.sync_cursor("followers") == 5000
+    assert staged(bot, "followers") == 5000
+    assert bot.store.count("followers") == 0
+    assert bot.store.last_sync() == 0
+
+    bot.sync_follows()
+    # the retry starts from page 2
+    assert fake_api.calls["followers_ids"] == 4
+    assert bot.store.count("followers") == 12000
+    assert bot.store.sync_cursor("followers") == -1
+    assert bot.store.generation("followers") == 1
+
+
+@pytest.fixture
+def changed_followers(bot, fake_api):
+    """
+    Two syncs: followers 4 and 5 unfollowed and 8 and 9 followed, follow 7
+    was dropped and 10 followed in between.
+    """
+    fake_api.users = {i: make_user(i) for i in range(1, 12)}
+    fake_api.followers = [1, 2, 3, 4, 5, 11]
+    fake_api.friends = [1, 2, 3, 4, 6, 7]
+    bot.sync_follows()
+    fake_api.followers = [1, 2, 3, 8, 9, 11]
+    fake_api.friends = [1, 2, 3, 4, 6, 10]
+    return bot.sync_follows()
+
+
+def test_changes_of_each_generation(bot, changed_followers):
+    assert {name: sorted(ids) for name, ids in changed_followers.items()} == {
+        "new_followers": [8, 9],
+        "lost_followers": [4, 5],
+        "new_follows": [10],
+        "lost_follows": [7],
+    }
+    assert bot.store.generation("followers") == 2
+    added, removed = bot.store.delta("followers", generation=1)
+    assert sorted(added) == [1, 2, 3, 4, 5, 11] and removed == []
+
+
+def test_delta_follow_back_candidates(bot, fake_api, changed_followers):
+    assert sorted(bot.follow_back_candidates()) == [8, 9, 11]
+    assert sorted(bot.follow_back_candidates(delta=True)) == [8, 9]
+
+    bot.auto_follow_followers(delta=True)
+    assert sorted(fake_api.followed) == [8, 9]
+
+
+def test_delta_unfollow_candidates(bot, changed_followers):
+    assert sorted(bot.unfollow_candidates()) == [4, 6, 10]
+    # 6 never followed back, only the lost follower and the new follow remain
+    assert sorted(bot.unfollow_candidates(delta=True)) == [4, 10]
+
+
+def test_old_generations_are_pruned(bot, fake_api, changed_followers):
+    bot.store.keep_changes = 2
+    fake_api.followers = [1, 2, 3]
+    bot.sync_follows()
+
+    assert bot.store.delta("followers", generation=1) == ([], [])
+    assert sorted(bot.store.delta("followers", generation=2)[0]) == [8, 9]
+    assert sorted(bot.store.delta("followers")[1]) == [8, 9, 11]
@@ -0,0 +1,213 @@
+"""
+Pooled HTTP transport shared by the Twitter API clients of every bot in a process.
+
+tweepy 3.x opens a new requests.Session, and with it new TLS connections, for
+every API call. The transport keeps one keep-alive connection pool instead,
+with retries and timeouts, and times the connects (TCP and TLS handshake) and
+the requests going through it.
+"""
+import threading
+import time
+
+import requests
+import tweepy
+
+from loguru import logger
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPSConnection
+from urllib3.connectionpool import HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+
+class LatencyStats:
+    """Thread-safe count, total and maximum of timings, per kind of timing."""
+
+    def __init__(self):
+        self._timings = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, seconds: float) -> None:
+        with self._lock:
+            count, total, longest = self._timings.get(kind, (0, 0.0, 0.0))
+            self._timings[kind] = (count + 1, total + seconds, max(longest, seconds))
+
+    def summary(self) -> dict:
+        """Returns the count, mean and max (in seconds) of every kind of timing."""
+        with self._lock:
+            return {
+                kind: {"count": count, "mean": total / count, "max": longest}
+                for kind, (count, total, longest) in self._timings.items()
+            }
+
+
+class TimedAdapter(HTTPAdapter):
+    """HTTPAdapter recording how long its connects and its requests take."""
+
+    def __init__(self, stats: LatencyStats, _logger=logger, **kwargs):
+        # init_poolmanager(), which needs these, is called by HTTPAdapter.__init__
+        self.stats = stats
+        self.logger = _logger
+        # last response received by each thread
+        self.local = threading.local()
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        stats, _logger = self.stats, self.logger
+
+        class TimedHTTPSConnection(HTTPSConnection):
+            def connect(self):
+                started = time.perf_counter()
+                super().connect()
+                seconds = time.perf_counter() - started
+                stats.record("connect", seconds)
+                _logger.debug(f"Connected to {self.host} in {seconds * 1000:.0f} ms.")
+
+        class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+            ConnectionCls = TimedHTTPSConnection
+
+        self.poolmanager.pool_classes_by_scheme = {
+            **self.poolmanager.pool_classes_by_scheme,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+    def send(self, request, **kwargs):
+        started = time.perf_counter()
+        response = super().send(request, **kwargs)
+        seconds = time.perf_counter() - started
+        self.stats.record("request", seconds)
+        self.local.response = response
+        self.logger.debug(
+            f"{request.method} {request.path_url.split('?')[0]} "
+            f"{response.status_code} in {seconds * 1000:.0f} ms."
+        )
+        return response
+
+
+class PooledSession(requests.Session):
+    """
+    Session sending its requests through a shared adapter. Each session keeps
+    its own headers and params, closing it leaves the shared pool open.
+    """
+
+    def __init__(self, adapter: HTTPAdapter, timeout: float = None):
+        super().__init__()
+        self.timeout = timeout
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().request(method, url, **kwargs)
+
+    def close(self) -> None:
+        pass
+
+
+class _PooledRequests:
+    """Stands in for the requests module in tweepy.binder (tweepy 3.x)."""
+
+    def __init__(self, transport):
+        self.transport = transport
+
+    def Session(self) -> PooledSession:
+        return self.transport.session()
+
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+
+class Transport:
+    """
+    Keep-alive connection pool for the API clients.
+
+    Up to `pool_size` connections per host are kept open. Connection errors, and
+    server errors on idempotent requests, are retried `retries` times with
+    exponential backoff; rate limiting is left to the bot's RateScheduler.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 32,
+        retries: int = 3,
+        backoff: float = 0.5,
+        timeout: float = 30.0,
+        _logger=logger,
+    ):
+        self.timeout = timeout
+        self.logger = _logger
+        self.stats = LatencyStats()
+        self.adapter = TimedAdapter(
+            self.stats,
+            _logger=_logger,
+            pool_connections=4,
+            pool_maxsize=pool_size,
+            max_retries=Retry(
+                total=retries,
+                backoff_factor=backoff,
+                status_forcelist=(500, 502, 503, 504),
+                raise_on_status=False,
+            ),
+        )
+
+    @classmethod
+    def from_settings(cls, settings: dict, _logger=logger) -> "Transport":
+        """
+        Builds a transport from the http_pool_size, http_retries, http_backoff and
+        http_timeout settings.
+        """
+        return cls(
+            pool_size=int(settings.get("http_pool_size", 32)),
+            retries=int(settings.get("http_retries", 3)),
+            backoff=float(settings.get("http_backoff", 0.5)),
+            timeout=float(settings.get("http_timeout", 30)),
+            _logger=_logger,
+        )
+
+    def session(self) -> PooledSession:
+        return PooledSession(self.adapter, timeout=self.timeout)
+
+    def call(self, method, *args, **kwargs) -> tuple:
+        """
+        Calls an API method and returns its result and the response it received.
+        The response is tracked per thread, so concurrent calls never see each
+        other's (rate limit) headers as tweepy's shared last_response would.
+        """
+        self.adapter.local.response = None
+        result = method(*args, **kwargs)
+        return result, self.adapter.local.response
+
+    def install(self, api: object) -> object:
+        """Routes the requests of a tweepy API through the pool and returns it."""
+        api.timeout = self.timeout
+        if hasattr(api, "session"):
+            # tweepy >= 4 keeps one session per API object
+            api.session = self.session()
+        else:
+            # tweepy 3.x creates a session per call in tweepy.binder
+            tweepy.binder.requests = _PooledRequests(self)
+        return api
+
+    def log_stats(self) -> None:
+        for kind, stats in self.stats.summary().items():
+            self.logger.info(
+                f"HTTP {kind}: {stats['count']} in total, mean "
+                f"{stats['mean'] * 1000:.0f} ms, max {stats['max'] * 1000:.0f} ms."
+            )
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def shared_transport(settings: dict, _logger=logger) -> Transport:
+    """
+    Returns the transport of the process, created from the settings of the first
+    bot that asks for it.
+    """
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = Transport.from_settings(settings, _logger=_logger)
+    return _transport
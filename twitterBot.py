@@ -19,24 +19,37 @@ the Twitter Bot library. If not, see http://www.gnu.org/licenses/.
 """
 
 import argparse
+import atexit
 import csv
-import random
+import queue
+import sqlite3
 import sys
 import time
 import pathlib
+import weakref
 
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
 import tweepy
 
 from argparse import RawTextHelpFormatter
-from collections import defaultdict
-from dateutil.parser import parse
 
 from loguru import logger as _loguru_logger
 
+from archive import iter_old_tweet_ids
+from bloom import BloomFilter, BloomIndex
+from cache import UserCache
+from filters import CandidateFilter, UnfollowFilter
+from harvest import AuthorHarvest
+from idset import IdSet
+from monitor import StalenessMonitor
+from pipeline import CandidatePipeline
+from ratelimit import RateScheduler, parse_limits
 from settings import ConfigSettings
-
-# Used for random timers
-random.seed()
+from snapshot import read_header, read_snapshot, write_snapshot
+from storage import StateStore
+from transport import shared_transport
 
 
 def logger(loglevel):
@@ -60,8 +73,43 @@ def logger(loglevel):
         return _loguru_logger
 
 
-def file_last_mod(file: str) -> int:
-    return pathlib.os.path.getmtime(file)
+def file_size(*files) -> int:
+    """Total size of the files that exist."""
+    return sum(pathlib.os.path.getsize(i) for i in files if pathlib.os.path.exists(i))
+
+
+# errors of API calls that got no response (connection errors and timeouts)
+REQUEST_ERRORS = (
+    getattr(tweepy, "TweepError", None) or tweepy.TweepyException,
+    requests.RequestException,
+    OSError,
+)
+
+
+def delete_error_kind(err: Exception) -> str:
+    """
+    Classifies a failed tweet deletion: "gone" (already deleted), "transient"
+    (connection error, rate limited or server error) or "fatal", which includes
+    any error that is not an API error.
+    """
+    status = getattr(getattr(err, "response", None), "status_code", None)
+    if status == 404:
+        return "gone"
+    if status == 429 or (status or 0) >= 500:
+        return "transient"
+    if status is None and isinstance(err, REQUEST_ERRORS):
+        return "transient"
+    return "fatal"
+
+
+# bots whose ignored users index is saved at exit, without keeping them alive
+_live_bots = weakref.WeakSet()
+
+
+@atexit.register
+def _save_ignored_ids() -> None:
+    for bot in list(_live_bots):
+        bot.save_ignored_ids()
 
 
 def divide_chunks(l: list, n: int) -> list:
@@ -75,48 +123,95 @@ class TwitterBot:
     Bot that automates several actions on Twitter, such as following users and favoriting tweets.
     """
 
-    def __init__(self, logger=_loguru_logger, user=""):
+    def __init__(self, logger=_loguru_logger, user="", user_cache=None):
         self.logger = logger
         # this variable contains the configuration for the bot
         self.default_settings = self.initialize_bot(user=user)
+        # this variable contains the local follower/following state of the handle
+        self.store = StateStore(self.default_settings["database_file"], _logger=logger)
+        self.store.migrate_from_files(self.default_settings)
+        # index of ignored user ids: a Bloom filter in front of the store, saved
+        # every `ignored_bloom_save_every` new ids and on exit
+        self._ignored_ids = None
+        _live_bots.add(self)
+        # table -> (last sync, IdSet) of the synced id lists kept in memory
+        self._synced_ids = {}
+        # profiles of hydrated users, so they are only looked up once per ttl; a
+        # cache shared with the bots of other handles can be passed in
+        self.shared_cache = user_cache is not None
+        self.user_cache = user_cache or UserCache(
+            self.store,
+            ttl=float(self.default_settings.get("user_cache_ttl", 86400)),
+            max_size=int(self.default_settings.get("user_cache_size", 100000)),
+            _logger=logger,
+        )
+        # follow/unfollow rules, configurable with the follow_* and unfollow_*
+        # settings or a rules_file
+        self.candidate_filter = CandidateFilter.from_settings(
+            self.default_settings,
+            twitter_handle=self.default_settings.get("twitter_handle"),
+        )
+        self.unfollow_filter = UnfollowFilter.from_settings(self.default_settings)
+        # name -> (overrides, filter) of the variants of the filters with some
+        # thresholds overridden, e.g. for hashtag authors, compiled once and kept
+        # with their rule order and counters
+        self.filter_variants = {}
+        # per-stage counters of the last candidate pipeline run by each workflow
+        self.follow_stats = {}
+        # paces the API calls with one token bucket per endpoint, plus a random
+        # jitter (in seconds) for human-like pacing; the daily budgets are kept in
+        # the store across runs
+        jitter = self.default_settings.get("rate_jitter", "0,2")
+        self.rate_scheduler = RateScheduler(
+            limits=parse_limits(self.default_settings),
+            jitter=tuple(float(i) for i in jitter.split(",")),
+            store=self.store,
+            _logger=logger,
+        )
+        # keep-alive connection pool shared by the API clients of every bot
+        self.transport = shared_transport(self.default_settings, _logger=logger)
         # this variable contains the authorized connection to the Twitter API
-        self._twitter = None
-
-    @property
-    def twitter(self) -> object:
-        """Reads in the bot configuration file and sets up the bot."""
-        # check how old the follower sync files are and recommend updating them
-        # if they are old
-        cur_time = time.time()
-        if (
-            cur_time - file_last_mod(self.default_settings["follows_file"]) > 86400
-            or cur_time - file_last_mod(self.default_settings["followers_file"]) > 86400
-        ):
-            self.logger.warning(
-                "Your Twitter follower sync files are more than a day old. "
-                "It is highly recommended that you sync them by calling sync_follows() "
-                "before continuing."
-            )
+        self.twitter = self.connect()
+        # recommends a sync when the follower sync is old, checked at startup and
+        # then every sync_check_interval seconds
+        self.sync_monitor = StalenessMonitor(
+            self.store.last_sync(),
+            max_age=float(self.default_settings.get("sync_max_age", 86400)),
+            interval=float(self.default_settings.get("sync_check_interval", 3600)),
+            _logger=logger,
+        )
+        self.sync_monitor.start()
 
-        # create an authorized connection to the Twitter API
-        if not self._twitter:
-            authentication = tweepy.OAuthHandler(
-                self.default_settings["api_key"], self.default_settings["api_secret"],
-            )
-            authentication.set_access_token(
-                self.default_settings["access_token_key"],
-                self.default_settings["access_token_secret"],
-            )
-            self._twitter = tweepy.API(authentication)
+    def connect(self) -> object:
+        """Creates an authorized connection to the Twitter API."""
+        authentication = tweepy.OAuthHandler(
+            self.default_settings["api_key"], self.default_settings["api_secret"],
+        )
+        authentication.set_access_token(
+            self.default_settings["access_token_key"],
+            self.default_settings["access_token_secret"],
+        )
+        return self.transport.install(tweepy.API(authentication))
 
-        return self._twitter
+    def wait(self, endpoint: str = "default") -> float:
+        """Blocks until the rate limit of endpoint allows another request."""
+        return self.rate_scheduler.acquire(endpoint)
 
-    def wait(self, min_time: int = 1, max_time: int = 10):
-        wait_time = random.randint(min_time, max_time)
-        if wait_time > 0:
-            self.logger.debug(f"sleeping for {wait_time} seconds before action.")
-            time.sleep(wait_time)
-        return wait_time
+    def call_api(self, endpoint: str, method, *args, **kwargs):
+        """Calls a Twitter API method, paced by the rate limit of endpoint."""
+        self.wait(endpoint)
+        try:
+            result, response = self.transport.call(method, *args, **kwargs)
+        except Exception as err:
+            response = getattr(err, "response", None)
+            self.rate_scheduler.update_from_headers(
+                endpoint, getattr(response, "headers", None)
+            )
+            raise
+        self.rate_scheduler.update_from_headers(
+            endpoint, getattr(response, "headers", None)
+        )
+        return result
 
     def initialize_bot(self, config_dir=".tweeterbot", user=None) -> dict:
         self.logger.debug("Initializing TweeterBot...")
@@ -130,7 +225,8 @@ class TwitterBot:
     def sync_follows(self):
         """
         Syncs the user's followers and follows locally so it isn't necessary
-        to repeatedly look them up via the Twitter API.
+        to repeatedly look them up via the Twitter API. Returns the followers
+        and follows gained and lost since the previous sync.
 
         It is important to run this method at least daily so the bot is working
         with a relatively up-to-date version of the user's follows.
@@ -142,89 +238,195 @@ class TwitterBot:
             f"Syncing {self.default_settings['twitter_handle']!r} "
             "account followers and followings."
         )
-        followers_ids = self.twitter.followers_ids()
-        with open(self.default_settings["followers_file"], "w") as out_file:
-            self.logger.debug(
-                f"Writing followers to file: {self.default_settings['followers_file']}"
-            )
-            for follower in followers_ids:
-                out_file.write(f"{follower}\n")
-        self.wait()
+        self.sync_ids("followers", self.twitter.followers_ids, "followers_ids")
 
         # sync the user's follows (accounts the user is following)
-        followings_ids = self.twitter.friends_ids()
-        with open(self.default_settings["follows_file"], "w") as out_file:
-            self.logger.debug(
-                f"Writing followers to file: {self.default_settings['follows_file']}"
+        self.sync_ids("follows", self.twitter.friends_ids, "friends_ids")
+        return self.finish_sync()
+
+    def finish_sync(self) -> dict:
+        """
+        Records the time of a completed sync, snapshots the synced ids and
+        returns the changes of the sync (see sync_changes).
+        """
+        synced_at = time.time()
+        self.store.set_meta("last_sync", synced_at)
+        self.sync_monitor.synced(synced_at)
+        for table in ("followers", "follows"):
+            write_snapshot(
+                self.default_settings[f"{table}_snapshot_file"],
+                self.store.ids(table),
+                synced_at=synced_at,
             )
-            for follow in followings_ids:
-                out_file.write(f"{follow}\n")
-        self.logger.info("Done syncing data with Twitter to file")
+        self.logger.info("Done syncing data with Twitter to database")
+        changes = self.sync_changes()
+        summary = ", ".join(
+            f"{len(ids)} {name.replace('_', ' ')}" for name, ids in changes.items()
+        )
+        self.logger.info(f"Sync changes: {summary}.")
+        return changes
+
+    def sync_ids(
+        self, table: str, api_method, endpoint: str = "default", count: int = 5000
+    ) -> tuple:
+        """
+        Pages through a cursored id listing (followers_ids, friends_ids) and stores
+        every page as it arrives.
+
+        The cursor of the next page is checkpointed with each page, so a sync that
+        was interrupted (e.g. rate limited) resumes from where it stopped the next
+        time it is called. Only the ids added or removed since the last sync are
+        written, the number of which is returned.
+        """
+        pages = self.page_ids(
+            endpoint, api_method, count=count, cursor=self.start_sync(table)
+        )
+        try:
+            for ids, cursor in pages:
+                self.stage_page(table, ids, cursor)
+        except Exception:
+            self.sync_failed(table)
+            raise
+        return self.commit_sync(table)
+
+    def start_sync(self, table: str) -> int:
+        """Returns the cursor to sync table from, -1 unless a sync was interrupted."""
+        cursor = self.store.sync_cursor(table)
+        if cursor == -1:
+            self.store.reset_sync(table)
+        else:
+            self.logger.info(f"Resuming {table} sync from cursor {cursor}.")
+        return cursor
+
+    def stage_page(self, table: str, ids: list, cursor: int) -> None:
+        """Stages a page of a sync and checkpoints the cursor of the next one."""
+        self.store.stage(table, ids, cursor)
+        self.logger.debug(f"Staged {len(ids)} {table}, next cursor: {cursor}.")
+
+    def sync_failed(self, table: str) -> None:
+        self.logger.error(
+            f"Failed to fetch {table} page, the sync will resume from this page on "
+            "the next run."
+        )
+
+    def commit_sync(self, table: str) -> tuple:
+        """Applies a sync whose pages were all staged, returns (added, removed)."""
+        added, removed = self.store.commit_sync(table)
+        self.logger.info(f"Synced {table}: {added} added, {removed} removed.")
+        return added, removed
+
+    def sync_changes(self) -> dict:
+        """Returns the followers and follows gained and lost during the last sync."""
+        new_followers, lost_followers = self.store.delta("followers")
+        new_follows, lost_follows = self.store.delta("follows")
+        return {
+            "new_followers": new_followers,
+            "lost_followers": lost_followers,
+            "new_follows": new_follows,
+            "lost_follows": lost_follows,
+        }
 
     def follow_user(
         self,
         user_obj: object,
-        n_followers: int = 100,
-        followers_follow_ratio: tuple = (0.6, 1.4),
-        n_tweets: int = 100,
+        n_followers: int = None,
+        followers_follow_ratio: tuple = None,
+        n_tweets: int = None,
     ) -> None:
-        """Allows the user to follow the user specified in the ID parameter."""
+        """
+        Allows the user to follow the user specified in the ID parameter.
+
+        The user is only followed if it passes the candidate filter, whose
+        thresholds can be overridden with the keyword arguments.
+        """
         if not hasattr(user_obj, "screen_name"):
             user_obj = user_obj.user
 
-        if self.ignore_user(
-            user_obj, check_user=True
-        ) or user_obj.screen_name == self.default_settings.get("TWITTER_HANDLE"):
-            return
-
         try:
-            ff_ratio = user_obj.followers_count / user_obj.friends_count
-
-            if not (followers_follow_ratio[0] <= ff_ratio <= followers_follow_ratio[1]):
-                # self.logger.warning(
-                #     f"Non-follow back user: {self.user_stats(user_obj)}"
-                # )
-                self.ignore_user(user_obj)
+            if not self.should_follow(
+                user_obj,
+                n_followers=n_followers,
+                followers_follow_ratio=followers_follow_ratio,
+                n_tweets=n_tweets,
+            ):
                 return
-        except Exception:
+        except Exception as error:
+            self.follow_failed(user_obj, error)
             return
+        return self.create_friendship(user_obj)
 
+    def create_friendship(self, user_obj: object):
+        """Follows a user that was already screened."""
         try:
-            if user_obj.followers_count < n_followers:
-                self.logger.warning(
-                    f"User: {user_obj.screen_name!r} has less than "
-                    f"{n_followers} followers, might be spam!"
-                )
-                self.ignore_user(user_obj)
-                return
-
-            elif user_obj.statuses_count < n_tweets:
-                self.logger.warning(f"Ghost user: {self.user_stats(user_obj)}")
-                self.ignore_user(user_obj)
-                return
-
-            elif user_obj.protected:
-                self.logger.warning(f"Protected user: {self.user_stats(user_obj)}")
-                self.ignore_user(user_obj)
-                return
-
-            elif user_obj.following:
-                self.logger.warning(f"Already following {self.user_stats(user_obj)}")
-                self.ignore_user(user_obj)
-                return
-
-            else:
-                self.logger.info(f"Followed @{self.user_stats(user_obj)}")
-                self.wait()
-                result = self.twitter.create_friendship(user_id=user_obj.id)
+            self.logger.info(f"Followed @{self.user_stats(user_obj)}")
+            result = self.call_api(
+                "follow", self.twitter.create_friendship, user_id=user_obj.id
+            )
+            self.user_cache.invalidate(user_obj.id)
         except Exception as error:
-            self.ignore_user(user_obj)
-            self.logger.error(str(error))
-            if "You are unable to follow more people at this time." in str(error):
-                raise RuntimeError(str(error))
+            self.follow_failed(user_obj, error)
         else:
+            self.record_follow(user_obj.id)
             return result
 
+    def record_follow(self, user_id: int) -> None:
+        """Records a new follow, so it is skipped before the next sync lists it."""
+        self.store.add("follows", [user_id])
+        self.load_synced_ids("follows").add(user_id)
+
+    def should_follow(self, user_obj: object, **overrides) -> bool:
+        """
+        Returns whether user_obj passes the ignore list and the candidate filter,
+        whose thresholds can be overridden. Rejected users are ignored from then on.
+        """
+        if self.ignore_user(user_obj, check_user=True):
+            return False
+
+        reason = self.rule_filter(
+            "follow_override", self.candidate_filter, **overrides
+        ).check(user_obj)
+        if reason:
+            self.rejected(user_obj, reason)
+            return False
+        return True
+
+    def rule_filter(self, name: str, base_filter, **overrides):
+        """
+        Returns base_filter with the thresholds of overrides that are not None.
+        The variant is compiled once and kept under name, with its learned rule
+        order and counters, until it is asked for with other thresholds.
+        """
+        overrides = {
+            key: value for key, value in overrides.items() if value is not None
+        }
+        if not overrides:
+            return base_filter
+        compiled_for, variant = self.filter_variants.get(name, (None, None))
+        if compiled_for != overrides:
+            variant = base_filter.replace(**overrides)
+            self.filter_variants[name] = (overrides, variant)
+        return variant
+
+    def rejected(self, user_obj: object, reason: str) -> None:
+        """
+        Ignores a user rejected by the candidate filter from then on, unless it
+        is the user itself or a user it already follows, who may be unfollowed.
+        """
+        if reason in ("self", "following"):
+            return
+        if reason != "ratio":
+            self.logger.warning(
+                f"Rejected user ({reason}): {self.user_stats(user_obj)}"
+            )
+        self.ignore_user(user_obj)
+
+    def follow_failed(self, user_obj: object, error: Exception) -> None:
+        """Ignores a user that could not be followed, stops once out of follows."""
+        self.ignore_user(user_obj)
+        self.logger.error(str(error))
+        if "You are unable to follow more people at this time." in str(error):
+            raise RuntimeError(str(error))
+
     @staticmethod
     def user_stats(user: object):
         """String formatter."""
@@ -246,188 +448,573 @@ class TwitterBot:
 
         return result
 
+    @property
+    def ignored_ids(self) -> BloomIndex:
+        """
+        Returns the index of ignored user ids. Ids missing from its Bloom filter,
+        the common case, are answered from memory; the others are looked up in
+        the non_following table of the store.
+        """
+        if self._ignored_ids is None:
+            self.logger.debug("Loading ignored users index.")
+            self._ignored_ids = BloomIndex(
+                self.load_ignored_bloom(),
+                lambda user_id: self.store.contains("non_following", user_id),
+            )
+        return self._ignored_ids
+
+    def load_ignored_bloom(self) -> BloomFilter:
+        """Loads the saved Bloom filter of ignored ids, rebuilt if out of date."""
+        count = self.store.count("non_following")
+        try:
+            bloom, saved_count = BloomFilter.load(
+                self.default_settings["ignored_bloom_file"]
+            )
+            if saved_count == count and count <= bloom.capacity:
+                return bloom
+            self.logger.debug("Ignored users bloom filter is out of date.")
+        except (KeyError, OSError, ValueError) as err:
+            self.logger.debug(f"Not using the ignored users bloom filter: {err}")
+        return self.rebuild_ignored_bloom(count)
+
+    def rebuild_ignored_bloom(self, count: int = None) -> BloomFilter:
+        """Builds the Bloom filter of the ignored ids from the store and saves it."""
+        if count is None:
+            count = self.store.count("non_following")
+        capacity = int(self.default_settings.get("ignored_bloom_capacity", 1000000))
+        bloom = BloomFilter(max(capacity, 2 * count))
+        bloom.update(self.store.ids("non_following"))
+        self.logger.info(
+            f"Built the bloom filter of {count} ignored users ({bloom.nbytes} bytes)."
+        )
+        if self.default_settings.get("ignored_bloom_file"):
+            bloom.save(self.default_settings["ignored_bloom_file"], count)
+        return bloom
+
+    def save_ignored_ids(self) -> None:
+        """Saves the Bloom filter of the ignored ids if ids were added to it."""
+        index = self._ignored_ids
+        if index is None or not index.dirty:
+            return
+        if self.default_settings.get("ignored_bloom_file"):
+            try:
+                count = self.store.count("non_following")
+            except sqlite3.ProgrammingError as err:
+                # the store was closed, the next run rebuilds the filter
+                self.logger.warning(f"Ignored users bloom filter not saved: {err}")
+                return
+            index.bloom.save(self.default_settings["ignored_bloom_file"], count)
+        index.dirty = 0
+
     def ignore_user(self, user_obj: object=None, user_id: int=None, check_user: bool = False):
-        """Write all users to file, that are likely spammers, protected, ghost users."""
-        # TODO: Write to database.
-        filename = self.default_settings["non_following_file"]
+        """Store all users, that are likely spammers, protected, ghost users."""
         if check_user:
-            with open(filename) as out_file:
-                ids = [i.strip() for i in out_file.readlines()]
-            return str(user_obj.id) in ids
+            return int(user_obj.id) in self.ignored_ids
 
-        with open(filename, "a") as out_file:
-            try:
-                out_file.write(f"{user_obj.id}\n")
-            except Exception:
-                out_file.write(f"{user_id}\n")
+        if user_obj is not None and hasattr(user_obj, "id"):
+            user_ids = [user_obj.id]
+        else:
+            user_ids = user_id if isinstance(user_id, list) else [user_id]
+        new_ids = [
+            int(i) for i in user_ids if i is not None and int(i) not in self.ignored_ids
+        ]
+        if not new_ids:
+            return
+
+        # write-through: keep the store and the in-memory index in sync
+        self.store.add("non_following", new_ids)
+        for i in new_ids:
+            self.ignored_ids.add(i)
+        save_every = int(self.default_settings.get("ignored_bloom_save_every", 1000))
+        if self.ignored_ids.dirty >= save_every:
+            self.save_ignored_ids()
 
     def unfollow_user(
         self,
         user_obj: object,
-        unfollow_verified: bool = False,
-        unfollow_protected: bool = False,
+        unfollow_verified: bool = None,
+        unfollow_protected: bool = None,
     ):
-        """Allows the user to unfollow the user specified in the ID parameter."""
+        """
+        Allows the user to unfollow the user specified in the ID parameter.
+
+        Verified and protected users are kept unless the unfollow filter (or the
+        keyword arguments) allow unfollowing them.
+        """
         try:
-            if user_obj.verified != unfollow_verified:
-                self.logger.warning(
-                    f"@{user_obj.screen_name} is verified, therefore will not unfollow."
-                )
-                self.ignore_user(user_obj)
+            if not self.should_unfollow(
+                user_obj,
+                unfollow_verified=unfollow_verified,
+                unfollow_protected=unfollow_protected,
+            ):
                 return
-            elif user_obj.protected != unfollow_protected:
-                self.ignore_user(user_obj)
-                return
-            elif not user_obj.following:
-                self.ignore_user(user_obj)
-                return
-            else:
-                self.wait()
-                result = self.twitter.destroy_friendship(user_id=user_obj.id)
-                self.logger.info(f"Unfollowed @{self.user_stats(result)}")
+            result = self.call_api(
+                "unfollow", self.twitter.destroy_friendship, user_id=user_obj.id
+            )
+            self.user_cache.invalidate(user_obj.id)
+            self.logger.info(f"Unfollowed @{self.user_stats(result)}")
         except Exception as error:
             self.logger.error(str(error))
 
-    def username_lookup(self, user_id):
-        """Find username by id."""
+    def should_unfollow(self, user_obj: object, **overrides) -> bool:
+        """
+        Returns whether user_obj passes the unfollow filter, whose settings can be
+        overridden. Users that are kept are ignored from then on.
+        """
+        reason = self.rule_filter(
+            "unfollow_override", self.unfollow_filter, **overrides
+        ).check(user_obj)
+        if reason:
+            if reason == "verified":
+                self.logger.warning(
+                    f"@{user_obj.screen_name} is verified, therefore will not unfollow."
+                )
+            self.ignore_user(user_obj)
+            return False
+        return True
+
+    def username_lookup(self, user_id) -> list:
+        """Find users by id."""
+        user_ids = user_id if isinstance(user_id, list) else [user_id]
+        return list(self.hydrate_users(user_ids))
+
+    def hydrate_users(self, user_ids: list, workers: int = 4):
+        """Streams the users of user_ids (see hydrate_batches)."""
+        for users in self.hydrate_batches(user_ids, workers):
+            yield from users
+
+    def hydrate_batches(self, user_ids: list, workers: int = 4):
+        """
+        Streams the users of user_ids, in batches.
+
+        Users are served from the user cache where possible. The ids missing from
+        it are looked up in batches of 100 (the users/lookup maximum), with up to
+        `workers` batches in flight within the "lookup" rate limit, and each batch
+        is yielded as soon as it arrives. The workers only call the API, the store
+        and the user cache are only used from the calling thread.
+        """
+        users, missing = self.cached_users(user_ids)
+        if users:
+            yield users
+
+        batches = divide_chunks(missing, 100)
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for batch in batches:
+                future = executor.submit(
+                    self.call_api, "lookup", self.twitter.lookup_users, user_ids=batch
+                )
+                in_flight[future] = batch
+                if len(in_flight) < workers:
+                    continue
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    users = self.hydrated_batch(future, in_flight.pop(future))
+                    if users:
+                        yield users
+            for future in list(in_flight):
+                users = self.hydrated_batch(future, in_flight.pop(future))
+                if users:
+                    yield users
+
+    def cached_users(self, user_ids: list) -> tuple:
+        """Returns the users of user_ids found in the user cache and the missing ids."""
+        users, missing = self.user_cache.get_many(user_ids)
+        self.logger.debug(
+            f"Hydrating {len(user_ids)} users, {len(user_ids) - len(missing)} cached."
+        )
+        if self.shared_cache and users:
+            # "following" is relative to the handle that looked the user up
+            not_followed = set(self.store.missing([u.id for u in users], "follows"))
+            users = [u._replace(following=u.id not in not_followed) for u in users]
+        return users, missing
+
+    def hydrated_batch(self, future, batch: list) -> list:
+        """
+        Caches the users of a finished users/lookup call (any kind of future). A
+        failed batch (e.g. rate limited) is skipped, its users are not ignored.
+        """
         try:
-            return self.twitter.lookup_users(
-                user_ids=user_id if isinstance(user_id, list) else [user_id]
-            )
-        except Exception:
-            self.ignore_user(user_id=user_id if isinstance(user_id, list) else [user_id])
+            fetched = future.result()
+        except Exception as err:
+            self.logger.error(f"Could not look up {len(batch)} users, skipped: {err}")
+            return []
+        self.user_cache.put_many(fetched)
+        return fetched
 
     # ----------------------------------
-    def get_do_not_follow_list(self) -> set:
-        """Returns the set of users the bot has already followed in the past."""
-        self.logger.debug("Getting all users I have already followed in the past.")
-        dnf_list = set()
-        with open(self.default_settings["already_followed_file"], "r") as in_file:
-            dnf_list.update(int(line) for line in in_file)
+    def known_ids(self) -> tuple:
+        """
+        Returns the in-memory id sets of the users not to follow: the ignored
+        users, the users followed in the past and the current follows.
+        """
+        return (
+            self.ignored_ids,
+            self.store.ids("already_followed"),
+            self.load_synced_ids("follows"),
+        )
 
-        with open(self.default_settings["non_following_file"], "r") as in_file:
-            dnf_list.update(int(line) for line in in_file)
+    def candidate_pipeline(self, workflow: str, candidate_filter=None):
+        """Returns a CandidatePipeline whose counters end up in follow_stats."""
+        pipeline = CandidatePipeline(
+            self.known_ids(),
+            candidate_filter or self.candidate_filter,
+            on_reject=self.rejected,
+        )
+        self.follow_stats[workflow] = pipeline.counts
+        return pipeline
+
+    def follow_admitted(self, pipeline, users: list) -> list:
+        """Follows the users of a batch the candidate pipeline admits."""
+        followed = []
+        for user_obj in pipeline.admit(users):
+            if self.create_friendship(user_obj):
+                pipeline.followed()
+                followed.append(user_obj)
+        return followed
+
+    def log_pipeline(self, workflow: str) -> None:
+        counts = self.follow_stats[workflow]
+        self.logger.info(
+            f"{workflow}: {counts['accepted']} of {counts['candidates']} candidates "
+            f"accepted, {counts['followed']} followed. Skipping known users saved "
+            f"{counts['saved_lookups']} lookups and {counts['saved_follows']} follows."
+        )
 
-        return dnf_list
+    def get_do_not_follow_list(self) -> IdSet:
+        """Returns the set of users the bot has already followed in the past."""
+        self.logger.debug("Getting all users I have already followed in the past.")
+        return self.store.ids("already_followed") | self.store.ids("non_following")
 
-    def get_followers_list(self) -> set:
+    def get_followers_list(self) -> IdSet:
         """Returns the set of users that are currently following the user."""
         self.logger.debug("Getting all followers.")
-        followers_list = set()
-        with open(self.default_settings["followers_file"], "r") as in_file:
-            followers_list.update(int(line) for line in in_file)
-        return followers_list
+        return self.load_synced_ids("followers")
 
-    def get_follows_list(self) -> set:
+    def get_follows_list(self) -> IdSet:
         """Returns the set of users that the user is currently following."""
         self.logger.debug("Getting all users I follow")
-        follows_list = set()
-        with open(self.default_settings["follows_file"], "r") as in_file:
-            follows_list.update(int(line) for line in in_file)
-        return follows_list
+        return self.load_synced_ids("follows")
+
+    def load_synced_ids(self, table: str) -> IdSet:
+        """
+        Returns the ids of a synced table from its binary snapshot, which is
+        memory-mapped instead of parsed, unless it is older than the last sync or
+        the table was written since (e.g. by record_follow). The ids are kept in
+        memory until the next sync.
+        """
+        last_sync = self.store.last_sync()
+        if table in self._synced_ids and self._synced_ids[table][0] == last_sync:
+            return self._synced_ids[table][1]
+
+        filename = self.default_settings.get(f"{table}_snapshot_file")
+        try:
+            synced_at = read_header(filename)[1]
+            if synced_at >= max(last_sync, self.store.modified(table)):
+                ids = read_snapshot(filename)[0]
+            else:
+                ids = self.store.ids(table)
+        except (OSError, TypeError, ValueError) as err:
+            self.logger.debug(f"Not using {table} snapshot: {err}")
+            ids = self.store.ids(table)
+        self._synced_ids[table] = (last_sync, ids)
+        return ids
 
     # ----------------------------------
     def search_tweets(self, phrase, count=100, result_type="recent"):
         """
         Returns a list of tweets matching a phrase (hashtag, word, etc.).
         """
-        return self.twitter.search(q=phrase, result_type=result_type, count=count)
+        pages = self.search_pages(phrase, count, result_type)
+        return [tweet for page in pages for tweet in page]
+
+    def search_pages(
+        self, phrase: str, count: int = 100, result_type="recent", since_id=None
+    ):
+        """
+        Streams the pages (up to 100 tweets) of the search results of phrase,
+        newest first, following the max_id cursor back until `count` tweets were
+        fetched or since_id is reached.
+        """
+        params = self.search_params(phrase, count, result_type, since_id)
+        left = count
+        while params:
+            page = self.call_api("search", self.twitter.search, **params)
+            if page:
+                yield page
+            left -= len(page)
+            params = self.next_search_params(params, page, left)
+
+    @staticmethod
+    def search_params(phrase: str, count: int, result_type="recent", since_id=None):
+        """Parameters of the first search call of search_pages, None if count < 1."""
+        if count < 1:
+            return None
+        params = {"q": phrase, "result_type": result_type, "count": min(100, count)}
+        if since_id:
+            params["since_id"] = since_id
+        return params
+
+    @staticmethod
+    def next_search_params(params: dict, page: list, left: int):
+        """
+        Parameters of the search call for the page older than page, None once
+        `left` is 0 or page is shorter than requested (the last one).
+        """
+        if left < 1 or len(page) < params["count"]:
+            return None
+        max_id = min(i.id for i in page) - 1
+        return {**params, "count": min(100, left), "max_id": max_id}
+
+    def search_authors(self, phrase: str, count: int = 200, result_type="recent"):
+        """
+        Streams the authors of the tweets about phrase, each author once.
+
+        Only the tweets newer than the ones seen by the previous search of the
+        phrase are fetched: the newest tweet id is stored once all pages were read.
+        """
+        for _, user_obj in self.harvest_authors([phrase], count, result_type):
+            yield user_obj
+
+    def harvest_authors(
+        self, phrases, count: int = 200, result_type="recent", workers: int = 4
+    ):
+        """Streams (phrase, author) for the new tweets about any of phrases."""
+        for phrase, users in self.harvest_batches(phrases, count, result_type, workers):
+            for user_obj in users:
+                yield phrase, user_obj
+
+    def harvest_batches(
+        self, phrases, count: int = 200, result_type="recent", workers: int = 4
+    ):
+        """
+        Streams (phrase, authors) for each page of new tweets about any of
+        phrases, each author once across all of them.
+
+        The searches of up to `workers` phrases run concurrently, within the
+        "search" rate limit. An AuthorHarvest can be passed instead of the list
+        of phrases to read its per-phrase stats afterwards.
+        """
+        harvest = phrases
+        if not isinstance(harvest, AuthorHarvest):
+            harvest = AuthorHarvest(self.store, phrases, _logger=self.logger)
+        # the workers only page through the search, the store is used from here
+        pages = queue.Queue()
+
+        def search(phrase, since_id):
+            try:
+                for page in self.search_pages(phrase, count, result_type, since_id):
+                    pages.put((phrase, page))
+            except Exception as err:
+                pages.put((phrase, err))
+            else:
+                pages.put((phrase, None))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for phrase in harvest.phrases:
+                executor.submit(search, phrase, harvest.since_id(phrase))
+            running = len(harvest.phrases)
+            while running:
+                phrase, page = pages.get()
+                if isinstance(page, list):
+                    users = harvest.add_page(phrase, page)
+                    if users:
+                        yield phrase, users
+                    continue
+                running -= 1
+                if page is None:
+                    harvest.finish(phrase)
+                else:
+                    self.logger.error(f"Search for {phrase!r} failed: {page}")
 
     def auto_follow_by_hashtag(
         self,
-        phrase: str,
+        phrase,
         friends_count: int = 300,
         count: int = 200,
         auto_sync: bool = False,
         result_type: str = "recent",
-    ):
-        """Follows anyone who tweets about a phrase (hashtag, word, etc.)."""
+    ) -> dict:
+        """
+        Follows anyone who tweets about a phrase (hashtag, word, etc.), or about
+        any of a list of phrases. Returns the per-phrase stats of the search.
+        """
         if auto_sync:
             self.sync_follows()
-        results = self.search_tweets(phrase, count, result_type)
-
-        screen_names_set = set(i.user.screen_name for i in results)
-
-        users_dict = defaultdict(list)
-        for result in results:
-            if result.user.screen_name in screen_names_set:
-                users_dict[result.user.screen_name] = result
-
-        statuses = [
-            i
-            for i in users_dict.values()
-            if i.user.screen_name != self.default_settings.get("TWITTER_HANDLE")
-            and not i.user.protected
-            and not i.user.following
-            and i.user.profile_image_url
-            and i.user.friends_count > friends_count
-            and i.user.statuses_count > count
-        ]
+        phrases = [phrase] if isinstance(phrase, str) else phrase
+        harvest = AuthorHarvest(self.store, phrases, _logger=self.logger)
+        pipeline = self.candidate_pipeline(
+            "auto_follow_by_hashtag", self.hashtag_filter(friends_count, count)
+        )
+        # authors are followed as they are found, while the searches go on
+        for _, users in self.harvest_batches(harvest, count, result_type):
+            for user_obj in self.follow_admitted(pipeline, users):
+                harvest.followed(user_obj.id)
+        self.log_pipeline("auto_follow_by_hashtag")
+        harvest.log_stats()
+        return harvest.stats
+
+    def hashtag_filter(self, friends_count: int = 300, count: int = 200):
+        """
+        Candidate filter for authors found by a search, compiled once. Authors
+        need more than friends_count friends and more than count tweets.
+        """
+        return self.rule_filter(
+            "hashtag",
+            self.candidate_filter,
+            n_friends=friends_count + 1,
+            n_tweets=max(self.candidate_filter.n_tweets, count + 1),
+            require_profile_image=True,
+        )
 
-        self.logger.info(f"Following {len(statuses)} users.")
-        for tweet in statuses:
-            if not self.ignore_user(tweet, check_user=True):
-                self.follow_user(tweet)
+    def auto_follow_followers(self, auto_sync=False, delta=False):
+        """
+        Follows back everyone who's followed you.
 
-    def auto_follow_followers(self, auto_sync=False):
-        """Follows back everyone who's followed you."""
+        With delta, only the followers gained during the last sync are considered.
+        """
         if auto_sync:
             self.sync_follows()
-        following = self.get_follows_list()
-        followers = self.get_followers_list()
-        already_followed = self.get_do_not_follow_list()
-        not_following_back = list(followers - following - already_followed)
+        not_following_back = self.follow_back_candidates(delta)
 
         if not not_following_back:
             self.logger.warning("No-one to follow.")
             return
 
-        try:
-            not_following_back = self.username_lookup(not_following_back[:99])
-        except Exception:
-            self.logger.exception("Could not find username.")
-            return
+        # users are followed as their batch is hydrated, not once all are
+        self.logger.info(f"Following up to {len(not_following_back)} users.")
+        pipeline = self.candidate_pipeline("auto_follow_followers")
+        for users in self.hydrate_batches(pipeline.unknown_ids(not_following_back)):
+            self.follow_admitted(pipeline, users)
+        self.log_pipeline("auto_follow_followers")
+
+    def follow_back_candidates(self, delta: bool = False) -> list:
+        """Returns the ids of the followers that were never followed back."""
+        if delta:
+            return self.store.delta_difference(
+                (("followers", True),),
+                "follows",
+                "already_followed",
+                "non_following",
+                within="followers",
+            )
+        return self.store.difference(
+            "followers", "follows", "already_followed", "non_following"
+        )
 
-        self.logger.info(f"Following {len(not_following_back)} users.")
-        for i in range(0, len(not_following_back), 99):
-            for user_obj in not_following_back[i : i + 99]:
-                self.follow_user(user_obj)
+    def page_ids(
+        self, endpoint: str, api_method, count: int = 5000, cursor: int = -1, **kwargs
+    ):
+        """
+        Streams (ids, next cursor) for the pages of a cursored id listing
+        (followers_ids, friends_ids), from cursor to the last page.
+        """
+        while cursor != 0:
+            ids, (_, cursor) = self.call_api(
+                endpoint, api_method, cursor=cursor, count=count, **kwargs
+            )
+            yield ids, cursor
 
     def auto_follow_followers_of_user(self, user_twitter_handle):
-        """Follows the followers of a specified user."""
-        followers_of_user = set(
-            self.twitter.followers_ids(screen_name=user_twitter_handle)
+        """
+        Follows the followers of a specified user.
+
+        Their follower ids are paged through one page (5000 ids) at a time. Ids
+        already followed, ignored or followed in the past are dropped in memory
+        before any lookup, and the rest are hydrated and followed as a stream, so
+        memory use does not depend on the number of followers of the user.
+        """
+        pages = self.page_ids(
+            "followers_ids", self.twitter.followers_ids, screen_name=user_twitter_handle
         )
-        followers_of_user = list(followers_of_user)
-        for i in range(0, len(followers_of_user), 99):
-            for user_id in followers_of_user[i : i + 99]:
-                self.follow_user(user_id)
+        pipeline = self.candidate_pipeline("auto_follow_followers_of_user")
+        for page, _ in pages:
+            candidates = pipeline.unknown_ids(page)
+            self.logger.info(
+                f"Following up to {len(candidates)} of {len(page)} followers of "
+                f"{user_twitter_handle!r}."
+            )
+            for users in self.hydrate_batches(candidates):
+                self.follow_admitted(pipeline, users)
+        self.log_pipeline("auto_follow_followers_of_user")
 
     def auto_unfollow_nonfollowers(
-        self, auto_sync: bool, unfollow_verified: bool,
+        self, auto_sync: bool, unfollow_verified: bool = None, delta: bool = False,
     ):
-        """Unfollows everyone who hasn't followed you back."""
+        """
+        Unfollows everyone who hasn't followed you back.
+
+        With delta, only the followers lost and the follows gained during the last
+        sync are considered.
+        """
         if auto_sync:
             self.sync_follows()
-        following = self.get_follows_list()
-        followers = self.get_followers_list()
-        already_followed_list = self.get_do_not_follow_list()
-        not_following_back = list(following - followers - already_followed_list)
+        not_following_back = self.unfollow_candidates(delta)
         if not not_following_back:
             return
 
-        # update the "already followed" file with users who didn't follow back
-        with open(self.default_settings["already_followed_file"], "w") as out_file:
-            for val in not_following_back:
-                out_file.write(f"{val}\n")
+        # update the "already followed" table with users who didn't follow back
+        self.store.add("already_followed", not_following_back)
 
-        non_followers = list(divide_chunks(not_following_back, 99))
-        _non_followers = [self.username_lookup(i) for i in non_followers]
-        flat_list = [item for sublist in _non_followers for item in sublist]
+        flat_list = self.username_lookup(not_following_back)
         self.logger.info(f"Un-following {len(flat_list)} users.")
         for user_obj in flat_list:
             self.unfollow_user(user_obj, unfollow_verified)
 
+    def unfollow_candidates(self, delta: bool = False) -> list:
+        """Returns the ids of the follows that don't follow back."""
+        if delta:
+            return self.store.delta_difference(
+                (("followers", False), ("follows", True)),
+                "followers",
+                "already_followed",
+                "non_following",
+                within="follows",
+            )
+        return self.store.difference(
+            "follows", "followers", "already_followed", "non_following"
+        )
+
+    def rule_stats(self) -> dict:
+        """
+        Returns the per-rule counters of the follow and unfollow filters and of
+        their variants ("hashtag", "follow_override" and "unfollow_override").
+        """
+        return {
+            "follow": self.candidate_filter.stats(),
+            "unfollow": self.unfollow_filter.stats(),
+            **{
+                name: rule_filter.stats()
+                for name, (_, rule_filter) in self.filter_variants.items()
+            },
+        }
+
+    def compact(self) -> None:
+        """
+        Rewrites the legacy non_following file with its ids deduplicated (from
+        the non_following table, which it was imported into), vacuums the
+        database and rebuilds the Bloom filter of the ignored ids.
+        """
+        filename = self.default_settings.get("non_following_file")
+        if filename and pathlib.Path(filename).exists():
+            with open(filename) as in_file:
+                lines = sum(1 for _ in in_file)
+            ids = self.store.ids("non_following")
+            tmp_path = pathlib.Path(f"{filename}.tmp")
+            with open(tmp_path, "w") as out_file:
+                out_file.writelines(f"{i}\n" for i in ids)
+            pathlib.os.replace(tmp_path, filename)
+            self.logger.info(f"Compacted {filename}: {lines} lines, {len(ids)} ids.")
+
+        size = file_size(self.store.filename, f"{self.store.filename}-wal")
+        self.store.vacuum()
+        self.logger.info(
+            f"Vacuumed {self.store.filename}: {size} to "
+            f"{file_size(self.store.filename)} bytes."
+        )
+        self.rebuild_ignored_bloom()
+        self._ignored_ids = None
+
     # ----------------------------------
     def unfollow_list_of_users(self, users=[]):
         """Unfollows a list of users"""
@@ -435,9 +1022,8 @@ class TwitterBot:
             assert isinstance(users, list)
             unfollow_users = users
         except Exception as err_msg:
-            self.logger.exception("Failed to parse list of users, will read from file")
-            with open(self.default_settings["non_followers_file"]) as in_file:
-                unfollow_users = [l.strip() for l in in_file.readlines() if l.strip()]
+            self.logger.exception("Failed to parse list of users, will read from database")
+            unfollow_users = list(self.store.ids("non_followers"))
 
         for user_id in unfollow_users:
             self.unfollow_user(user_id)
@@ -465,23 +1051,87 @@ class TwitterBot:
         except Exception:
             self.logger.error("Failed to send tweet!")
 
-    def nuke_old_tweets(self, to_date="2000-01-01", tweets_csv_file=None):
+    def destroy_status(self, tweet_id: int, retries: int = 3, backoff: float = 2.0):
         """
-        Open browser and go to https://twitter.com/settings/account
-        Click: get your Your Twitter archive
-        ---wait for file then download and extract to directory---
+        Deletes a tweet, retrying with exponential backoff on transient errors
+        (connection errors, rate limiting and server errors).
 
-        to_date: str
-            date to delete from!
-            format: YYYY-MM-DD
-        tweet_csv_file: csv
-            location where the file is stored
+        Returns True once the tweet is gone, including when it was already deleted.
+        """
+        for attempt in range(retries + 1):
+            try:
+                self.call_api("delete", self.twitter.destroy_status, id=tweet_id)
+                return True
+            except Exception as err:
+                delay = self.retry_delay(tweet_id, err, attempt, retries, backoff)
+                if delay is None:
+                    return True
+                time.sleep(delay)
+
+    def retry_delay(
+        self, tweet_id: int, err: Exception, attempt: int, retries: int, backoff: float
+    ):
+        """
+        Returns how long to wait before retrying a failed deletion, None when
+        the tweet is already gone. Raises err if it is not to be retried.
         """
-        global count
+        kind = delete_error_kind(err)
+        if kind == "gone":
+            return None
+        if kind != "transient" or attempt == retries:
+            raise err
+        delay = backoff * 2 ** attempt
+        self.logger.warning(
+            f"Failed to delete tweet {tweet_id}: {err}, retrying in {delay}s."
+        )
+        return delay
+
+    def delete_tweets(self, tweet_ids, workers: int = 4, retries: int = 3) -> int:
+        """
+        Deletes tweets concurrently with a bounded pool of workers.
+
+        The delete rate is set by the "delete" rate limit of the scheduler. Deleted
+        ids are logged in the store, so tweets deleted by a previous (crashed) run
+        are skipped. Returns the number of tweets deleted.
+        """
+        done = self.store.ids("deleted_tweets")
+        deleted = 0
+
+        def record(finished):
+            nonlocal deleted
+            ids = []
+            for future in finished:
+                tweet_id = in_flight.pop(future)
+                try:
+                    future.result()
+                except Exception as err:
+                    self.logger.error(f"Could not delete tweet {tweet_id}: {err}")
+                else:
+                    self.logger.info(f"Deleted tweet: {tweet_id}")
+                    ids.append(tweet_id)
+            self.store.add("deleted_tweets", ids)
+            deleted += len(ids)
+
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for tweet_id in tweet_ids:
+                if tweet_id in done:
+                    continue
+                future = executor.submit(self.destroy_status, tweet_id, retries)
+                in_flight[future] = tweet_id
+                if len(in_flight) >= workers * 2:
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    record(finished)
+            record(wait(in_flight)[0])
+
+        return deleted
+
+    def check_nuke_args(self, to_date: str, tweets_csv_file) -> bool:
+        """Returns whether the arguments of nuke_old_tweets are usable."""
         self.logger.info(f"Deleting old tweets from {to_date}!!!")
-        _deleted = False
         if tweets_csv_file is None:
-            self.logger.error("Need a CSV file to continue")
+            self.logger.error("Need an archive file to continue")
+            return False
 
         try:
             time.strptime(to_date, "%Y-%m-%d")
@@ -489,32 +1139,36 @@ class TwitterBot:
             self.logger.error(
                 "Date must be in correct format [expected format: YYYY-MM-DD]!!"
             )
+            return False
+        return True
+
+    def nuke_old_tweets(self, to_date="2000-01-01", tweets_csv_file=None, workers=4):
+        """
+        Open browser and go to https://twitter.com/settings/account
+        Click: get your Your Twitter archive
+        ---wait for file then download and extract to directory---
+
+        to_date: str
+            date to delete from!
+            format: YYYY-MM-DD
+        tweet_csv_file: csv, js or zip
+            location where the archive is stored: a tweets.csv file, a tweets.js
+            file or the downloaded archive zip
+        workers: int
+            number of tweets deleted concurrently
+        """
+        if not self.check_nuke_args(to_date, tweets_csv_file):
             return
 
         try:
-            input_file = csv.DictReader(open(tweets_csv_file))
-        except Exception:
+            old_tweet_ids = iter_old_tweet_ids(tweets_csv_file, to_date)
+            deleted = self.delete_tweets(old_tweet_ids, workers=workers)
+        except (OSError, ValueError, csv.Error):
             self.logger.error("File corrupted: retry")
             return
 
-        deleted_tweets = []
-        for count, row in enumerate(input_file, 1):
-            tweet_timestamp = parse(
-                row.get("timestamp", "1999-01-01"), ignoretz=True
-            ).date()
-            tweet_id = int(row.get("tweet_id", 0))
-            if to_date != "" and tweet_timestamp < parse(to_date).date():
-                try:
-                    self.wait()
-                    _state = self.twitter.destroy_status(id=tweet_id)
-                    row = row.get("text", "").replace("\n", "")
-                    self.logger.info(f"Deleted tweet: {tweet_timestamp}: {row}")
-                    deleted_tweets.append(_state)
-                except Exception as err:
-                    self.logger.error("%s" % (str(err)))
-
-        if deleted_tweets:
-            self.logger.info(f"Number of deleted tweets: {count}")
+        if deleted:
+            self.logger.info(f"Number of deleted tweets: {deleted}")
 
 
 if __name__ == "__main__":
@@ -540,6 +1194,15 @@ if __name__ == "__main__":
     parser.add_argument(
         "--no-sync", action="store_false", default=True, help="Do not resync."
     )
+    parser.add_argument(
+        "--delta",
+        action="store_true",
+        default=False,
+        help=(
+            "Only follow back/unfollow users whose follow status changed during\n"
+            "the last sync instead of checking every follower and following.\n"
+        ),
+    )
     parser.add_argument(
         "--tweet", "-t", nargs="+", type=str, action="store", help="message to post."
     )
@@ -555,12 +1218,33 @@ if __name__ == "__main__":
         "--username",
         "-u",
         type=str,
-        required=True,
         action="store",
         help="Twitter username.",
     )
     parser.add_argument(
-        "--follow-by-hashtag", action="store", help="Follow users by hashtag.",
+        "--daemon",
+        action="store_true",
+        default=False,
+        help=(
+            "Keep running and repeat the sync, follow and unfollow actions on\n"
+            "their intervals (sync_interval, follow_back_interval,\n"
+            "unfollow_interval and hashtag_interval in config.ini, in seconds).\n"
+        ),
+    )
+    parser.add_argument(
+        "--all-accounts",
+        action="store_true",
+        default=False,
+        help=(
+            "Run the sync, follow and unfollow actions for every account in\n"
+            "config.ini concurrently, from a single process.\n"
+        ),
+    )
+    parser.add_argument(
+        "--follow-by-hashtag",
+        nargs="+",
+        action="store",
+        help="Follow users by hashtag, several hashtags are searched concurrently.",
     )
     parser.add_argument(
         "--follow-back",
@@ -579,12 +1263,22 @@ if __name__ == "__main__":
         action="store",
         help=(
             "Delete old tweets, you will be prompted for a date of which tweets will be "
-            "deleted from. Add your csv path as argument.\n"
-            "Note: \tYou need to download your Twitter archive csv file, \n"
+            "deleted from. Add your archive path (tweets.csv, tweets.js or the\n"
+            "archive zip) as argument.\n"
+            "Note: \tYou need to download your Twitter archive, \n"
             "\twhich can be downloaded here: https://twitter.com/settings/account \n"
             "\tfollow the instructions to download.\n"
         ),
     )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        default=False,
+        help=(
+            "Deduplicate the non-following file, vacuum the database and rebuild\n"
+            "the bloom filter of ignored users.\n"
+        ),
+    )
     parser.add_argument(
         "--loglevel",
         default="INFO",
@@ -597,12 +1291,69 @@ if __name__ == "__main__":
 
     parsed_args = parser.parse_args()
     args = vars(parsed_args)
+    if not args.get("username") and not args.get("all_accounts"):
+        parser.error("one of the arguments --username/-u --all-accounts is required")
 
     log = logger(args.get("loglevel", "INFO").upper())
-    tweeter_bot = TwitterBot(logger=log, user=args.get("username"))
 
+    jobs = []
+    if args.get("compact"):
+        jobs.append(("compact", {}))
     if args.get("sync"):
-        tweeter_bot.sync_follows()
+        jobs.append(("sync_follows", {}))
+    if args.get("follow_by_hashtag"):
+        jobs.append(
+            (
+                "auto_follow_by_hashtag",
+                {
+                    "phrase": args.get("follow_by_hashtag"),
+                    "auto_sync": args.get("no_sync"),
+                },
+            )
+        )
+    if args.get("follow_back"):
+        jobs.append(
+            (
+                "auto_follow_followers",
+                {"auto_sync": args.get("no_sync"), "delta": args.get("delta")},
+            )
+        )
+    if args.get("unfollow"):
+        jobs.append(
+            (
+                "auto_unfollow_nonfollowers",
+                {"auto_sync": args.get("no_sync"), "delta": args.get("delta")},
+            )
+        )
+
+    if args.get("daemon"):
+        from runner import MultiAccountRunner
+
+        # jobs keep their own interval and never resync on their own
+        intervals = {
+            "auto_follow_by_hashtag": ("hashtag_interval", 3600),
+            "auto_follow_followers": ("follow_back_interval", 3600),
+            "auto_unfollow_nonfollowers": ("unfollow_interval", 86400),
+        }
+        daemon_jobs = [("sync_follows", {}, "sync_interval", 86400)]
+        for name, kwargs in jobs:
+            if name in intervals:
+                daemon_jobs.append(
+                    (name, {**kwargs, "auto_sync": False}, *intervals[name])
+                )
+        handles = None if args.get("all_accounts") else [args.get("username")]
+        MultiAccountRunner(handles=handles, _logger=log).run_forever(daemon_jobs)
+        sys.exit(0)
+
+    if args.get("all_accounts"):
+        from runner import MultiAccountRunner
+
+        if args.get("tweet") or args.get("tweet_image") or args.get("nuke_old_tweets"):
+            parser.error("tweeting and deleting tweets need a single --username")
+        MultiAccountRunner(_logger=log).run(jobs)
+        sys.exit(0)
+
+    tweeter_bot = TwitterBot(logger=log, user=args.get("username"))
 
     if args.get("tweet") or args.get("tweet_image"):
         if args.get("tweet_image"):
@@ -624,21 +1375,12 @@ if __name__ == "__main__":
                 msg += "\n\n#100DaysOfCode #Code #UdacityLevelUp"
             tweeter_bot.send_tweet(msg)
 
-    if args.get("follow_by_hashtag"):
-        tweeter_bot.auto_follow_by_hashtag(
-            phrase=args.get("follow_by_hashtag"), auto_sync=args.get("no_sync")
-        )
-
-    if args.get("follow_back"):
-        tweeter_bot.auto_follow_followers(auto_sync=args.get("no_sync"))
-
-    if args.get("unfollow"):
-        tweeter_bot.auto_unfollow_nonfollowers(
-            auto_sync=args.get("no_sync"), unfollow_verified=False
-        )
+    for name, kwargs in jobs:
+        getattr(tweeter_bot, name)(**kwargs)
 
     if args.get("nuke_old_tweets"):
         date = input("Enter date to start deleting tweets from!!!\n[YYYY-MM-DD] >> ")
         tweeter_bot.nuke_old_tweets(
             to_date=date, tweets_csv_file=args.get("nuke_old_tweets")
         )
+    tweeter_bot.transport.log_stats()